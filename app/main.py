@@ -8,6 +8,7 @@ import sys
 from pathlib import Path
 import logging
 from datetime import datetime
+from html import escape
 
 # Add src directory to path
 sys.path.append(str(Path(__file__).parent.parent / 'src'))
@@ -20,6 +21,19 @@ from llm_engine import MedBotRAG
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Only the most recent messages are kept in the session (and re-sent on rerun)
+MAX_MESSAGES = 50
+
+# Urgency banner of a disease card, precomputed per urgency level
+URGENCY_HTML = {
+    level: f'<div class="urgency-{level}">\n{emoji} <strong>Urgence:</strong> {text}\n</div>'
+    for level, emoji, text in [
+        ("high", "🔴", "HAUTE"),
+        ("medium", "🟡", "MOYENNE"),
+        ("low", "🟢", "BASSE"),
+    ]
+}
+
 # Page configuration
 st.set_page_config(
     page_title="MedBot - Assistant Médical",
@@ -28,76 +42,56 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
-# Custom CSS for better UI
-st.markdown("""
-<style>
-    .main-header {
-        font-size: 2.5rem;
-        color: #1f77b4;
-        text-align: center;
-        padding: 1rem;
-        background: linear-gradient(90deg, #e3f2fd 0%, #bbdefb 100%);
-        border-radius: 10px;
-        margin-bottom: 2rem;
-    }
-    
-    .urgency-high {
-        background-color: #ffebee;
-        border-left: 5px solid #f44336;
-        padding: 10px;
-        border-radius: 5px;
-    }
-    
-    .urgency-medium {
-        background-color: #fff3e0;
-        border-left: 5px solid #ff9800;
-        padding: 10px;
-        border-radius: 5px;
-    }
-    
-    .urgency-low {
-        background-color: #e8f5e9;
-        border-left: 5px solid #4caf50;
-        padding: 10px;
-        border-radius: 5px;
-    }
+
+@st.cache_resource
+def load_css() -> str:
+    """Read the custom stylesheet once per process"""
+    return (Path(__file__).parent / 'style.css').read_text(encoding='utf-8')
+
+
+@st.cache_resource(show_spinner="Chargement des composants médicaux...")
+def get_components():
+    """Load the heavy MedBot components once per process (shared by all sessions)"""
+    logger.info("Loading MedBot components...")
     
-    .disease-card {
-        background-color: #f5f5f5;
-        padding: 15px;
-        border-radius: 10px;
-        margin: 10px 0;
-        border-left: 4px solid #1f77b4;
-    }
+    symptom_extractor = SymptomExtractor()
+    knowledge_graph = MedicalKnowledgeGraph()
     
-    .footer {
-        text-align: center;
-        padding: 20px;
-        color: #666;
-        font-size: 0.9rem;
-    }
-</style>
-""", unsafe_allow_html=True)
-
-
-def load_components():
-    """Load and cache the MedBot components"""
-    try:
-        logger.info("Loading MedBot components...")
-        
-        # Initialize components
-        symptom_extractor = SymptomExtractor()
-        knowledge_graph = MedicalKnowledgeGraph()
-        rag_engine = MedBotRAG()
-        
-        logger.info("✓ All components loaded successfully")
-        
-        return symptom_extractor, knowledge_graph, rag_engine
+    logger.info("✓ All components loaded successfully")
     
-    except Exception as e:
-        logger.error(f"Error loading components: {e}")
-        st.error(f"Erreur lors du chargement des composants: {e}")
-        return None, None, None
+    return symptom_extractor, knowledge_graph
+
+
+@st.cache_data(ttl=600)
+def get_graph_statistics(_knowledge_graph):
+    """Graph statistics only change when the ontology is rebuilt"""
+    return _knowledge_graph.get_graph_statistics()
+
+
+@st.cache_data(ttl=3600, max_entries=1024)
+def cached_query(symptoms_key: tuple, top_n: int = 3):
+    """Best diseases matching a tuple of normalized symptoms (in extraction order)"""
+    _, knowledge_graph = get_components()
+    return knowledge_graph.query_diseases_by_symptoms(list(symptoms_key), top_n=top_n)
+
+
+@st.cache_data(ttl=3600, max_entries=1024)
+def cached_details(uri: str):
+    """Full details of a disease, keyed on its URI"""
+    _, knowledge_graph = get_components()
+    return knowledge_graph.get_disease_details(uri)
+
+
+@st.cache_data(ttl=3600, max_entries=1024)
+def get_top_diseases(symptoms_key: tuple) -> list:
+    """Top 3 diseases for a symptom key, enriched with their full details"""
+    diseases = cached_query(symptoms_key)
+    for disease in diseases:
+        details = cached_details(disease['uri'])
+        if details:
+            disease['specialty'] = details.get('specialty')
+            disease['precautions'] = details.get('precautions', [])
+    return diseases
 
 
 def initialize_session_state():
@@ -111,56 +105,108 @@ def initialize_session_state():
     if 'conversation_count' not in st.session_state:
         st.session_state.conversation_count = 0
     
-    # Cache components in session state to avoid reloading
-    if 'components_loaded' not in st.session_state:
-        st.session_state.components_loaded = False
+    # The RAG engine holds the conversation history, so it stays per session
+    if 'rag_engine' not in st.session_state:
+        st.session_state.rag_engine = MedBotRAG()
 
 
-def display_disease_card(disease: dict, rank: int):
-    """Display a disease information card"""
-    urgency = disease.get('urgency', 'medium').lower()
-    urgency_class = f"urgency-{urgency}"
-    
-    st.markdown(f"""
-    <div class="disease-card">
-        <h4>#{rank} - {disease['name']}</h4>
-        <p><strong>Correspondance:</strong> {disease.get('match_percentage', 0):.1f}%</p>
-    </div>
-    """, unsafe_allow_html=True)
-    
-    # Urgency indicator
-    urgency_emoji = {"high": "🔴", "medium": "🟡", "low": "🟢"}
-    urgency_text = {"high": "HAUTE", "medium": "MOYENNE", "low": "BASSE"}
-    
-    st.markdown(f"""
-    <div class="{urgency_class}">
-        {urgency_emoji.get(urgency, '🟡')} <strong>Urgence:</strong> {urgency_text.get(urgency, 'MOYENNE')}
-    </div>
-    """, unsafe_allow_html=True)
+@st.cache_data(ttl=3600, max_entries=1024)
+def _render_card_html(
+    name: str,
+    rank: int,
+    urgency: str,
+    match_pct: float,
+    matched_tuple: tuple,
+    spec_tuple: tuple,
+    precautions_tuple: tuple
+) -> str:
+    """Build the HTML of a disease card (memoized on its hashable fields)"""
+    parts = [
+        '<div class="disease-card">',
+        f'<h4>#{rank} - {escape(name)}</h4>',
+        f'<p><strong>Correspondance:</strong> {match_pct:.1f}%</p>',
+        '</div>',
+        URGENCY_HTML.get(urgency, URGENCY_HTML["medium"])
+    ]
     
     # Matched symptoms
-    if disease.get('matched_symptoms'):
-        st.write("**Symptômes concordants:**")
-        st.write(", ".join(disease['matched_symptoms']))
+    if matched_tuple:
+        parts.append(f"<p><strong>Symptômes concordants:</strong><br>{escape(', '.join(matched_tuple))}</p>")
     
-    # Specialty info
-    if 'specialty' in disease and disease['specialty']:
-        spec = disease['specialty']
-        if isinstance(spec, dict):
-            col1, col2 = st.columns(2)
-            with col1:
-                st.write(f"**Spécialité:** {spec.get('specialty', 'N/A')}")
-            with col2:
-                st.write(f"**Département:** {spec.get('department', 'N/A')}")
-            
-            if spec.get('location'):
-                st.write(f"**Localisation:** {spec['location']}")
+    # Specialty info: (specialty, department, location)
+    if spec_tuple:
+        specialty, department, location = spec_tuple
+        parts.append(
+            f"<p><strong>Spécialité:</strong> {escape(specialty or 'N/A')} &nbsp;|&nbsp; "
+            f"<strong>Département:</strong> {escape(department or 'N/A')}</p>"
+        )
+        if location:
+            parts.append(f"<p><strong>Localisation:</strong> {escape(location)}</p>")
     
     # Precautions
-    if disease.get('precautions'):
-        with st.expander("📋 Précautions recommandées"):
-            for i, precaution in enumerate(disease['precautions'][:5], 1):
-                st.write(f"{i}. {precaution}")
+    if precautions_tuple:
+        items = "".join(f"<li>{escape(p)}</li>" for p in precautions_tuple[:5])
+        parts.append(f"<details><summary>📋 Précautions recommandées</summary><ol>{items}</ol></details>")
+    
+    return "\n".join(parts)
+
+
+def add_message(message: dict):
+    """Append a message to the chat history, dropping the oldest ones"""
+    st.session_state.messages.append(message)
+    st.session_state.messages = st.session_state.messages[-MAX_MESSAGES:]
+
+
+def disease_card_html(disease: dict, rank: int) -> str:
+    """HTML of a disease information card"""
+    spec = disease.get('specialty')
+    spec_tuple = None
+    if spec and isinstance(spec, dict):
+        spec_tuple = (spec.get('specialty'), spec.get('department'), spec.get('location'))
+    
+    return _render_card_html(
+        disease['name'],
+        rank,
+        disease.get('urgency', 'medium').lower(),
+        disease.get('match_percentage', 0),
+        tuple(disease.get('matched_symptoms') or ()),
+        spec_tuple,
+        tuple(disease.get('precautions') or ())
+    )
+
+
+def render_cards_html(diseases: list) -> str:
+    """Collapsible HTML of the top 3 cards, stored with the message and replayed as is"""
+    return "\n".join(
+        f"<details><summary>Voir détails - {escape(disease['name'])}</summary>\n"
+        f"{disease_card_html(disease, i)}\n</details>"
+        for i, disease in enumerate(diseases[:3], 1)
+    )
+
+
+def display_disease_card(disease: dict, rank: int):
+    """Display a disease information card"""
+    # A single markdown call = a single markdown parse per card
+    st.markdown(disease_card_html(disease, rank), unsafe_allow_html=True)
+
+
+def render_disease_cards(diseases: list, expand_first: bool = False):
+    """Display the detailed cards of an assistant message (top 3 diseases)"""
+    st.subheader("🔍 Analyses détaillées")
+    for i, disease in enumerate(diseases[:3], 1):
+        with st.expander(f"Voir détails - {disease['name']}", expanded=(expand_first and i == 1)):
+            display_disease_card(disease, i)
+
+
+def render_message(message: dict):
+    """Display one message of the chat history"""
+    with st.chat_message(message["role"]):
+        st.markdown(message["content"])
+        
+        # Replay the cards rendered when the answer was generated
+        if message.get("rendered_cards_html"):
+            st.subheader("🔍 Analyses détaillées")
+            st.markdown(message["rendered_cards_html"], unsafe_allow_html=True)
 
 
 def main():
@@ -169,6 +215,9 @@ def main():
     # Initialize session state
     initialize_session_state()
     
+    # Custom CSS for better UI (st.html skips the markdown pipeline)
+    st.html(f"<style>{load_css()}</style>")
+    
     # Header
     st.markdown("""
     <div class="main-header">
@@ -176,23 +225,14 @@ def main():
     </div>
     """, unsafe_allow_html=True)
     
-    # Load components (only once per session)
-    if not st.session_state.components_loaded:
-        with st.spinner("Chargement des composants médicaux..."):
-            symptom_extractor, knowledge_graph, rag_engine = load_components()
-            
-            if all([symptom_extractor, knowledge_graph, rag_engine]):
-                st.session_state.symptom_extractor = symptom_extractor
-                st.session_state.knowledge_graph = knowledge_graph
-                st.session_state.rag_engine = rag_engine
-                st.session_state.components_loaded = True
-            else:
-                st.error("❌ Erreur: Impossible de charger les composants nécessaires")
-                st.stop()
+    # Load components (cached process-wide)
+    try:
+        symptom_extractor, knowledge_graph = get_components()
+    except Exception as e:
+        logger.error(f"Error loading components: {e}")
+        st.error(f"❌ Erreur: Impossible de charger les composants nécessaires ({e})")
+        st.stop()
     
-    # Get components from session state
-    symptom_extractor = st.session_state.symptom_extractor
-    knowledge_graph = st.session_state.knowledge_graph
     rag_engine = st.session_state.rag_engine
     
     # Sidebar
@@ -214,7 +254,7 @@ def main():
         st.header("📊 Statistiques du Système")
         
         try:
-            stats = knowledge_graph.get_graph_statistics()
+            stats = get_graph_statistics(knowledge_graph)
             
             col1, col2 = st.columns(2)
             with col1:
@@ -264,20 +304,12 @@ def main():
     
     # Display chat messages
     for message in st.session_state.messages:
-        with st.chat_message(message["role"]):
-            st.markdown(message["content"])
-            
-            # Display disease cards if available
-            if message["role"] == "assistant" and "diseases" in message:
-                st.subheader("🔍 Analyses détaillées")
-                for i, disease in enumerate(message["diseases"][:3], 1):
-                    with st.expander(f"Voir détails - {disease['name']}"):
-                        display_disease_card(disease, i)
+        render_message(message)
     
     # Chat input
     if prompt := st.chat_input("Décrivez vos symptômes..."):
         # Add user message to chat
-        st.session_state.messages.append({"role": "user", "content": prompt})
+        add_message({"role": "user", "content": prompt})
         
         with st.chat_message("user"):
             st.markdown(prompt)
@@ -295,7 +327,7 @@ def main():
                     if not symptoms:
                         response = "Je n'ai pas pu identifier de symptômes spécifiques. Pouvez-vous décrire vos symptômes plus précisément ?" if st.session_state.language == 'fr' else "I couldn't identify specific symptoms. Can you describe your symptoms more precisely?"
                         st.markdown(response)
-                        st.session_state.messages.append({
+                        add_message({
                             "role": "assistant",
                             "content": response
                         })
@@ -305,43 +337,34 @@ def main():
                         
                         # Step 2: Query knowledge graph
                         symptom_names = [s['normalized'] for s in symptoms]
-                        diseases = knowledge_graph.query_diseases_by_symptoms(symptom_names)
+                        symptoms_key = tuple(symptom_names)
                         
-                        # Enrich disease data with full details
-                        for disease in diseases[:3]:  # Top 3
-                            details = knowledge_graph.get_disease_details(disease['uri'])
-                            if details:
-                                disease['specialty'] = details.get('specialty')
-                                disease['precautions'] = details.get('precautions', [])
+                        # Top 3, enriched with full details
+                        diseases = get_top_diseases(symptoms_key)
                         
-                        # Step 3: Generate LLM response
-                        response = rag_engine.generate_response(
+                        # Step 3: Generate LLM response (displayed as it is generated)
+                        response = st.write_stream(rag_engine.generate_response_stream(
                             user_input=prompt,
                             query_results=diseases,
                             language=st.session_state.language
-                        )
-                        
-                        st.markdown(response)
+                        ))
                         
-                        # Store message with disease data
-                        st.session_state.messages.append({
+                        # Store message with its prerendered disease cards
+                        add_message({
                             "role": "assistant",
                             "content": response,
-                            "diseases": diseases[:3]
+                            "rendered_cards_html": render_cards_html(diseases)
                         })
                         
                         # Display disease cards
                         if diseases:
-                            st.subheader("🔍 Analyses détaillées")
-                            for i, disease in enumerate(diseases[:3], 1):
-                                with st.expander(f"Voir détails - {disease['name']}", expanded=(i==1)):
-                                    display_disease_card(disease, i)
+                            render_disease_cards(diseases, expand_first=True)
                 
                 except Exception as e:
                     logger.error(f"Error processing message: {e}")
                     error_msg = f"Erreur lors du traitement: {e}" if st.session_state.language == 'fr' else f"Error processing: {e}"
                     st.error(error_msg)
-                    st.session_state.messages.append({
+                    add_message({
                         "role": "assistant",
                         "content": error_msg
                     })
@@ -1,7 +1,11 @@
 from rdflib import Graph, Namespace, Literal, URIRef
 from rdflib.namespace import RDF, RDFS, OWL, XSD
-import json
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+import argparse
+import orjson
 import os
+import pickle
 
 # --- 1. DÉFINITION DES NAMESPACES (Le "Vocabulaire") ---
 # MED : Notre schéma (T-Box) -> Les concepts
@@ -9,6 +13,15 @@ import os
 MED = Namespace("http://medbot.org/ontology#")
 INST = Namespace("http://medbot.org/instances#")
 
+# Caractères interdits dans les URIs d'instances (un seul passage str.translate)
+# Ex: "toxic look (typhos)" -> "toxic_look_typhos"
+_URI_TABLE = str.maketrans({' ': '_', '(': None, ')': None, "'": None, '&': 'and'})
+
+@lru_cache(maxsize=None)
+def safe_uri(prefix, name):
+    """URI d'instance mémoïsée : les mêmes symptômes reviennent pour chaque maladie"""
+    return INST[f"{prefix}_{name.translate(_URI_TABLE)}"]
+
 def create_ontology_structure(g):
     """
     Définit la T-Box : Le squelette du graphe.
@@ -75,18 +88,20 @@ def populate_knowledge_graph(g, data):
     # Caches pour éviter de créer 50 fois le département "Cardiology"
     dept_cache = {}
     spec_cache = {}
+    
+    # Les triplets sont accumulés puis insérés en une seule fois (g.addN)
+    triples = []
 
     # --- ÉTAPE 1 : LES DÉPARTEMENTS ---
     # Ils sont la base physique de l'hôpital
     for d in data['departments']:
         # Nettoyage URI (Ex: "Internal Medicine" -> "Dept_Internal_Medicine")
-        safe_name = d['Department'].replace(' ', '_').replace('&', 'and')
-        dept_uri = INST[f"Dept_{safe_name}"]
+        dept_uri = safe_uri("Dept", d['Department'])
         
-        g.add((dept_uri, RDF.type, MED.Department))
-        g.add((dept_uri, MED.departmentName, Literal(d['Department'])))
-        g.add((dept_uri, MED.location, Literal(d['Location'])))
-        g.add((dept_uri, MED.floor, Literal(d['Floor'])))
+        triples.append((dept_uri, RDF.type, MED.Department, g))
+        triples.append((dept_uri, MED.departmentName, Literal(d['Department']), g))
+        triples.append((dept_uri, MED.location, Literal(d['Location']), g))
+        triples.append((dept_uri, MED.floor, Literal(d['Floor']), g))
         
         # Stockage en mémoire pour lier les spécialités plus tard
         dept_cache[d['Department']] = dept_uri
@@ -94,52 +109,69 @@ def populate_knowledge_graph(g, data):
     # --- ÉTAPE 2 : MALADIES & SYMPTÔMES ---
     for d in data['diseases']:
         # Création URI Maladie
-        dis_safe = d['disease'].replace(' ', '_').replace('(', '').replace(')', '')
-        dis_uri = INST[f"Disease_{dis_safe}"]
+        dis_uri = safe_uri("Disease", d['disease'])
         
-        g.add((dis_uri, RDF.type, MED.Disease))
-        g.add((dis_uri, MED.diseaseName, Literal(d['disease'])))
-        g.add((dis_uri, MED.urgencyLevel, Literal(d['urgency'])))
+        triples.append((dis_uri, RDF.type, MED.Disease, g))
+        triples.append((dis_uri, MED.diseaseName, Literal(d['disease']), g))
+        triples.append((dis_uri, MED.urgencyLevel, Literal(d['urgency']), g))
 
         # GESTION SPÉCIALITÉ & SLOTS (Logique Métier)
         # On récupère la spécialité liée à cette maladie
         spec_name = d['specialty']
         if spec_name not in spec_cache:
-            spec_uri = INST[f"Spec_{spec_name.replace(' ', '_')}"]
-            g.add((spec_uri, RDF.type, MED.MedicalSpecialty))
-            g.add((spec_uri, MED.specialtyName, Literal(spec_name)))
+            spec_uri = safe_uri("Spec", spec_name)
+            triples.append((spec_uri, RDF.type, MED.MedicalSpecialty, g))
+            triples.append((spec_uri, MED.specialtyName, Literal(spec_name), g))
             
             # Lien Spécialité -> Département
             target_dept = d['department']
             if target_dept in dept_cache:
                 dept_uri = dept_cache[target_dept]
-                g.add((spec_uri, MED.belongsToDepartment, dept_uri))
+                triples.append((spec_uri, MED.belongsToDepartment, dept_uri, g))
                 
                 # Use Case : On ajoute les slots au Département (issu de la spécialité)
                 # Note : C'est une simplification pour le MVP, on prend les slots de la 1ère spécialité vue
-                g.add((dept_uri, MED.availableSlots, Literal(d.get('available_slots', 0))))
+                triples.append((dept_uri, MED.availableSlots, Literal(d.get('available_slots', 0)), g))
 
             spec_cache[spec_name] = spec_uri
         
         # Lien Maladie -> Spécialité
-        g.add((dis_uri, MED.treatedBy, spec_cache[spec_name]))
+        triples.append((dis_uri, MED.treatedBy, spec_cache[spec_name], g))
 
         # GESTION SYMPTÔMES
         for s in d['symptoms']:
-            sym_safe = s['name'].replace(' ', '_').replace('(', '').replace(')', '').replace("'", "")
-            sym_uri = INST[f"Sym_{sym_safe}"]
+            sym_uri = safe_uri("Sym", s['name'])
             
             # Définition du symptôme
-            g.add((sym_uri, RDF.type, MED.Symptom))
-            g.add((sym_uri, MED.symptomName, Literal(s['name'])))
-            g.add((sym_uri, MED.severityLevel, Literal(s['severity'])))
+            triples.append((sym_uri, RDF.type, MED.Symptom, g))
+            triples.append((sym_uri, MED.symptomName, Literal(s['name']), g))
+            triples.append((sym_uri, MED.severityLevel, Literal(s['severity']), g))
             
             # Lien Maladie -> A comme symptôme -> Symptôme
-            g.add((dis_uri, MED.hasSymptom, sym_uri))
+            triples.append((dis_uri, MED.hasSymptom, sym_uri, g))
+
+    g.addN(triples)
 
     return g
 
-def main():
+def load_json(path):
+    """Charge le JSON consolidé"""
+    with open(path, 'rb') as f:
+        return orjson.loads(f.read())
+
+def is_cache_fresh(cache_path, sources):
+    """Le cache est valide s'il est plus récent que toutes ses sources"""
+    if not os.path.exists(cache_path):
+        return False
+    cache_mtime = os.path.getmtime(cache_path)
+    return all(os.path.getmtime(src) < cache_mtime for src in sources)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Génère le graphe de connaissances médical")
+    parser.add_argument('--pretty', action='store_true',
+                        help="Génère aussi les versions lisibles Turtle (.ttl) et RDF/XML (.owl)")
+    args = parser.parse_args(argv)
+
     # Configuration des chemins robustes
     base_dir = os.path.dirname(os.path.abspath(__file__))
     json_path = os.path.join(base_dir, '..', 'data', 'processed', 'consolidated_medical_data.json')
@@ -154,24 +186,46 @@ def main():
 
     # Exécution
     try:
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
+        # Cache binaire des triplets : évite de reconstruire T-Box + A-Box tant
+        # que le JSON (et ce script) n'ont pas changé
+        graph_cache = os.path.join(ontology_dir, 'graph.pkl')
+        if is_cache_fresh(graph_cache, [json_path, os.path.abspath(__file__)]):
+            print(f"Chargement du graphe depuis le cache : {graph_cache}")
+            with open(graph_cache, 'rb') as f:
+                triples = pickle.load(f)
+            g.addN((s, p, o, g) for s, p, o in triples)
+        else:
+            # Lecture du JSON en arrière-plan pendant la construction de la T-Box
+            with ThreadPoolExecutor(max_workers=1) as ex:
+                data_future = ex.submit(load_json, json_path)
+                g = create_ontology_structure(g)
+                data = data_future.result()
+                
+            g = populate_knowledge_graph(g, data)
             
-        g = create_ontology_structure(g)
-        g = populate_knowledge_graph(g, data)
+            with open(graph_cache, 'wb') as f:
+                pickle.dump(list(g), f, protocol=5)
         
-        # --- Sauvegarde en format Turtle (.ttl) ---
-        output_ttl = os.path.join(ontology_dir, 'medical_ontology.ttl')
-        g.serialize(destination=output_ttl, format='turtle')
-        print(f"Fichier Turtle généré : {output_ttl}")
-
-        # --- Sauvegarde en format RDF/XML (.owl) ---
-        output_owl = os.path.join(ontology_dir, 'medical_ontology.owl')
-        g.serialize(destination=output_owl, format='xml')
-        print(f"Fichier OWL (RDF/XML) généré : {output_owl}")
+        # --- Sauvegarde en format N-Triples (.nt) ---
+        # Une ligne par triplet : écriture en flux, et relu plus vite que le Turtle
+        # par query_engine
+        output_nt = os.path.join(ontology_dir, 'medical_ontology.nt')
+        g.serialize(destination=output_nt, format='nt', encoding='utf-8')
+        print(f"Fichier N-Triples généré : {output_nt}")
+
+        if args.pretty:
+            # --- Sauvegarde en format Turtle (.ttl) ---
+            output_ttl = os.path.join(ontology_dir, 'medical_ontology.ttl')
+            g.serialize(destination=output_ttl, format='turtle')
+            print(f"Fichier Turtle généré : {output_ttl}")
+
+            # --- Sauvegarde en format RDF/XML (.owl) ---
+            output_owl = os.path.join(ontology_dir, 'medical_ontology.owl')
+            g.serialize(destination=output_owl, format='xml')
+            print(f"Fichier OWL (RDF/XML) généré : {output_owl}")
         
         print(f"SUCCÈS : Graphe généré avec {len(g)} triplets !")
-        print(f"Fichier : {output_ttl}")
+        print(f"Fichier : {output_nt}")
         
     except FileNotFoundError:
         print(f"ERREUR : Impossible de trouver {json_path}")
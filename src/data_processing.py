@@ -1,23 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd
+import orjson
 import re
-import json
 import os
 
+# Correction des typos connues du dataset Kaggle
+CORRECTIONS = {
+    "peptic ulcer diseae": "peptic ulcer disease",
+    "dimorphic hemmorhoids(piles)": "dimorphic hemmorhoids",
+    "paroymsal positional vertigo": "paroxysmal positional vertigo",
+    "(vertigo) paroymsal positional vertigo": "paroxysmal positional vertigo"
+}
+
 def clean_text(text):
     """Nettoyage robuste pour Symptômes ET Maladies"""
     if pd.isna(text): return None
     text = str(text).lower()                 # Minuscules
     text = text.replace('_', ' ')            # Pas d'underscore
     text = re.sub(r'\s+', ' ', text).strip() # Pas d'espaces en trop
-    
-    # Correction des typos connues du dataset Kaggle
-    corrections = {
-        "peptic ulcer diseae": "peptic ulcer disease",
-        "dimorphic hemmorhoids(piles)": "dimorphic hemmorhoids",
-        "paroymsal positional vertigo": "paroxysmal positional vertigo",
-        "(vertigo) paroymsal positional vertigo": "paroxysmal positional vertigo"
-    }
-    return corrections.get(text, text)
+    return CORRECTIONS.get(text, text)
+
+def clean_text_vectorized(series):
+    """Même nettoyage que clean_text, appliqué à toute une colonne via .str"""
+    s = (series.astype('string')
+         .str.lower()
+         .str.replace('_', ' ', regex=False)
+         .str.replace(r'\s+', ' ', regex=True)
+         .str.strip())
+    return s.map(CORRECTIONS).fillna(s)
 
 def process_disease_data():
     print("🔄 Chargement des données...")
@@ -33,10 +43,11 @@ def process_disease_data():
     os.makedirs(processed_path, exist_ok=True)
 
     try:
-        df_diseases = pd.read_csv(os.path.join(raw_path, 'dataset.csv'))
-        df_severity = pd.read_csv(os.path.join(raw_path, 'Symptom-severity.csv'))
-        df_specialties = pd.read_csv(os.path.join(raw_path, 'medical_specialties.csv'))
-        df_departments = pd.read_csv(os.path.join(raw_path, 'departments.csv'))
+        # Lectures indépendantes (I/O) : lancées en parallèle
+        files = ['dataset.csv', 'Symptom-severity.csv', 'medical_specialties.csv', 'departments.csv']
+        with ThreadPoolExecutor(max_workers=len(files)) as ex:
+            futures = [ex.submit(pd.read_csv, os.path.join(raw_path, name)) for name in files]
+            df_diseases, df_severity, df_specialties, df_departments = [f.result() for f in futures]
     except FileNotFoundError as e:
         print(f"❌ ERREUR CRITIQUE : Fichier introuvable.\nLe script cherche ici : {raw_path}\nVérifie que tes fichiers CSV sont bien dans le dossier 'data/raw'.")
         raise e
@@ -44,55 +55,62 @@ def process_disease_data():
     # 1. NETTOYAGE PRÉALABLE
     print("🧹 Normalisation des noms...")
     for df in [df_diseases, df_specialties]:
-        df['Disease'] = df['Disease'].apply(clean_text)
+        df['Disease'] = clean_text_vectorized(df['Disease'])
     
-    df_severity['Symptom'] = df_severity['Symptom'].apply(clean_text)
-    severity_map = dict(zip(df_severity['Symptom'], df_severity['weight']))
+    df_severity['Symptom'] = clean_text_vectorized(df_severity['Symptom'])
+    # Dernier poids gagnant en cas de doublon (comme l'ancien dict)
+    severity = (df_severity.drop_duplicates('Symptom', keep='last')
+                .rename(columns={'Symptom': 'sym', 'weight': 'severity'})[['sym', 'severity']])
 
     # 2. AGRÉGATION
-    diseases_data = []
+    # Format long (une ligne par couple maladie/symptôme) : un seul stack() de
+    # toutes les colonnes au lieu d'un filtrage du DataFrame par maladie
     unique_diseases = df_diseases['Disease'].unique()
 
     print(f"⚙️ Traitement de {len(unique_diseases)} maladies uniques...")
 
+    long = (df_diseases.set_index('Disease')
+            .stack(future_stack=True)
+            .dropna()
+            .rename('sym')
+            .reset_index(level='Disease'))
+    long['sym'] = clean_text_vectorized(long['sym'])
+    long = long[long['sym'].str.len() > 0].drop_duplicates(['Disease', 'sym'])
+    # Jointure vectorisée sur la gravité (3 par défaut pour un symptôme inconnu)
+    long = long.merge(severity, on='sym', how='left')
+    long['severity'] = long['severity'].fillna(3).astype('int16')
+
+    # Un seul parcours des colonnes (pas de sous-DataFrame par groupe)
+    symptoms_by_disease = {}
+    for disease_name, s, w in zip(long['Disease'].tolist(), long['sym'].tolist(), long['severity'].tolist()):
+        symptoms_by_disease.setdefault(disease_name, []).append({'name': s, 'severity': w})
+
+    spec_by_disease = df_specialties.drop_duplicates('Disease').set_index('Disease')
     for disease_name in unique_diseases:
-        disease_rows = df_diseases[df_diseases['Disease'] == disease_name]
-        
-        all_symptoms = set()
-        for col in df_diseases.columns[1:]:
-            symptoms = disease_rows[col].dropna().apply(clean_text).tolist()
-            all_symptoms.update(symptoms)
-        
-        formatted_symptoms = []
-        for s in all_symptoms:
-            if s:
-                formatted_symptoms.append({
-                    'name': s,
-                    'severity': int(severity_map.get(s, 3))
-                })
-
-        spec_info = df_specialties[df_specialties['Disease'] == disease_name]
-        
-        if not spec_info.empty:
-            row = spec_info.iloc[0]
-            diseases_data.append({
-                'disease': disease_name,
-                'symptoms': formatted_symptoms,
-                'specialty': row['Specialty'],
-                'department': row['Department'],
-                'urgency': row['Urgency'],
-                'available_slots': int(row['AvailableSlots'])
-            })
-        else:
+        if disease_name not in spec_by_disease.index:
             print(f"⚠️ Pas de spécialité pour : '{disease_name}'")
 
+    merged = spec_by_disease.reindex([d for d in unique_diseases if d in spec_by_disease.index])
+    diseases_data = [
+        {
+            'disease': disease_name,
+            'symptoms': symptoms_by_disease.get(disease_name, []),
+            'specialty': row['Specialty'],
+            'department': row['Department'],
+            'urgency': row['Urgency'],
+            'available_slots': int(row['AvailableSlots'])
+        }
+        for disease_name, row in merged.iterrows()
+    ]
+
     # 3. SAUVEGARDE
     output_file = os.path.join(processed_path, 'consolidated_medical_data.json')
-    with open(output_file, 'w', encoding='utf-8') as f:
-        json.dump({
+    # orjson encode directement en UTF-8 (même rendu que json.dump indent=2)
+    with open(output_file, 'wb') as f:
+        f.write(orjson.dumps({
             'diseases': diseases_data,
             'departments': df_departments.to_dict('records')
-        }, f, indent=2, ensure_ascii=False)
+        }, option=orjson.OPT_INDENT_2 | orjson.OPT_SERIALIZE_NUMPY))
 
     print(f"✅ SUCCÈS : Données sauvegardées dans {output_file}")
     print(f"   Total maladies traitées : {len(diseases_data)}")
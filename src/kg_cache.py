@@ -0,0 +1,68 @@
+"""
+Knowledge Graph Cache for MedBot
+Content-addressed on-disk cache of the parsed ontology and its indexes, shared
+by every process loading the same ontology (app, tests, validation script)
+"""
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Iterable, Optional
+import hashlib
+import logging
+import os
+import pickle
+
+logger = logging.getLogger(__name__)
+
+# Cache directory (entries are named after the hash of their sources)
+CACHE_DIR = Path(os.getenv('MEDBOT_CACHE_DIR', str(Path.home() / '.cache' / 'medbot')))
+
+
+def cache_path(sources: Iterable[str], variant: str) -> Path:
+    """
+    Cache entry of a set of source files: any change to their content (not
+    just their mtime) gives a new entry
+
+    Args:
+        sources: Files the cached data is derived from
+        variant: Distinguishes entries built from the same sources (e.g. store)
+    """
+    digest = hashlib.sha256()
+    for source in sources:
+        digest.update(Path(source).read_bytes())
+    return CACHE_DIR / f"{digest.hexdigest()[:32]}.{variant}.pkl"
+
+
+def load(path: Path) -> Optional[object]:
+    """Unpickle a cache entry (None if missing or unreadable)"""
+    try:
+        with open(path, 'rb') as f:
+            return pickle.load(f)
+    except FileNotFoundError:
+        return None
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable cache entry {path}: {e}")
+        return None
+
+
+def save(path: Path, data: object):
+    """Pickle a cache entry atomically (concurrent writers never expose a partial file)"""
+    tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(data, f, protocol=5)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        logger.warning(f"Could not write cache entry {path}: {e}")
+        tmp_path.unlink(missing_ok=True)
+
+
+@lru_cache(maxsize=None)
+def load_kg(ontology_path: Optional[str] = None):
+    """
+    Knowledge graph of an ontology, built once per process and reloaded from
+    the on-disk cache when another process already parsed the same ontology
+    """
+    from query_engine import MedicalKnowledgeGraph
+    return MedicalKnowledgeGraph(ontology_path)
@@ -4,23 +4,98 @@ Generates empathetic medical responses using Ollama and retrieved context
 """
 
 from langchain_ollama import OllamaLLM
-from typing import List, Dict, Optional
+from langchain_core.outputs import Generation
+from langchain_community.cache import SQLiteCache
+from typing import List, Dict, Iterator, Optional
+from collections import OrderedDict, defaultdict, deque
+from functools import lru_cache
+from itertools import islice
+import asyncio
+import httpx
 import logging
 import os
+import threading
 
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Exact-match cache of LLM responses, shared process-wide (empty = disabled).
+# Only deterministic engines use it: a sampled response must not be frozen
+LLM_CACHE_PATH = os.getenv('LLM_CACHE_PATH', '.medbot_llm_cache.db')
+
+# Maximum number of formatted contexts kept in memory
+CONTEXT_CACHE_SIZE = 128
+
+# HTTP settings of the Ollama clients: connections are kept alive between
+# turns (and shared by concurrent batch requests) instead of reopened
+OLLAMA_TIMEOUT = float(os.getenv('OLLAMA_TIMEOUT', '120'))
+OLLAMA_LIMITS = httpx.Limits(max_keepalive_connections=16, max_connections=32, keepalive_expiry=300)
+
+# Messages kept in the conversation history (10 exchanges)
+MAX_HISTORY = 20
+
+# Complete prompt of each language (filled by _build_prompt)
+PROMPT_TEMPLATES = {
+    'fr': """{system_prompt}
+
+Contexte du Graphe de Connaissances:
+{context}
+
+Historique de conversation:
+{history}
+
+Patient: {user_input}
+
+Assistant MedBot:""",
+    'en': """{system_prompt}
+
+Knowledge Graph Context:
+{context}
+
+Conversation History:
+{history}
+
+Patient: {user_input}
+
+MedBot Assistant:"""
+}
+
+# Context blocks of one disease (format_context)
+DISEASE_TEMPLATE = """
+Maladie #{rank}: {name}
+- Score de correspondance: {match_percentage:.1f}%
+- Symptômes associés: {symptoms}
+- Symptômes concordants: {matched_symptoms}
+- Niveau d'urgence: {urgency}
+"""
+SPECIALTY_TEMPLATE = (
+    "- Spécialité recommandée: {specialty}\n"
+    "- Département: {department}\n"
+    "- Localisation: {location}\n"
+)
+
+
+@lru_cache(maxsize=None)
+def _open_llm_cache(path: str) -> SQLiteCache:
+    """SQLite cache of LLM responses, opened once per process and database"""
+    logger.info(f"✓ LLM response cache: {path}")
+    return SQLiteCache(database_path=path)
+
 
 class MedBotRAG:
     """RAG-based medical chatbot using Ollama LLM"""
     
+    # Formatted contexts keyed on the fields they render (LRU, shared by all sessions)
+    _context_cache: "OrderedDict[tuple, str]" = OrderedDict()
+    _context_cache_lock = threading.Lock()
+    
     def __init__(
         self,
         ollama_base_url: Optional[str] = None,
         model_name: Optional[str] = None,
-        language: str = "fr"
+        language: str = "fr",
+        deterministic: bool = False
     ):
         """
         Initialize the MedBot RAG engine
@@ -29,17 +104,33 @@ class MedBotRAG:
             ollama_base_url: Base URL for Ollama API
             model_name: Name of the model to use
             language: Default language ('fr' or 'en')
+            deterministic: Use temperature 0 so identical prompts give identical
+                responses, and reuse them from the LLM response cache
+        
+        Concurrency is bounded by OLLAMA_NUM_PARALLEL, which should match the
+        server setting (the server also reads OLLAMA_MAX_LOADED_MODELS)
         """
         self.ollama_base_url = ollama_base_url or os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434')
         self.model_name = model_name or os.getenv('MODEL_NAME', 'mistral')
         self.language = language
+        self.temperature = 0.0 if deterministic else 0.7
+        self.num_parallel = max(1, int(os.getenv('OLLAMA_NUM_PARALLEL', '4')))
+        
+        # Cached responses are keyed on the prompt and every setting that changes
+        # the response (LangChain's own key for OllamaLLM only holds its type)
+        self.response_cache = _open_llm_cache(LLM_CACHE_PATH) if deterministic and LLM_CACHE_PATH else None
+        self._cache_key = str(sorted({
+            'model': self.model_name,
+            'base_url': self.ollama_base_url,
+            'temperature': self.temperature
+        }.items()))
         
         # Initialize LLM
         self.llm = None
         self._initialize_llm()
         
-        # Conversation history
-        self.conversation_history = []
+        # Conversation history (oldest messages are dropped)
+        self.conversation_history = deque(maxlen=MAX_HISTORY)
     
     def _initialize_llm(self):
         """Initialize connection to Ollama"""
@@ -49,7 +140,8 @@ class MedBotRAG:
             self.llm = OllamaLLM(
                 base_url=self.ollama_base_url,
                 model=self.model_name,
-                temperature=0.7  # Balance between creativity and consistency
+                temperature=self.temperature,  # 0.7 balances creativity and consistency
+                client_kwargs={'timeout': OLLAMA_TIMEOUT, 'limits': OLLAMA_LIMITS}
             )
             
             # Test connection with a simple prompt
@@ -61,7 +153,9 @@ class MedBotRAG:
             logger.error(f"Run: ollama pull {self.model_name}")
             self.llm = None
     
-    def _get_system_prompt(self, language: str = "fr") -> str:
+    @staticmethod
+    @lru_cache(maxsize=4)
+    def _get_system_prompt(language: str = "fr") -> str:
         """Get the system prompt based on language"""
         if language == "fr":
             return """Tu es MedBot, un assistant médical intelligent et empathique basé sur une ontologie médicale.
@@ -119,34 +213,134 @@ Structure your response:
         if not query_results:
             return "Aucune maladie correspondante trouvée dans notre base de données."
         
+        key = self._context_key(query_results)
+        cache = self._context_cache
+        with self._context_cache_lock:
+            context = cache.get(key)
+            if context is not None:
+                cache.move_to_end(key)
+                return context
+        
+        context = self._format_context(query_results)
+        
+        with self._context_cache_lock:
+            cache[key] = context
+            if len(cache) > CONTEXT_CACHE_SIZE:
+                cache.popitem(last=False)
+        return context
+    
+    @staticmethod
+    def _context_key(query_results: List[Dict]) -> tuple:
+        """Hashable key made of every field rendered by format_context"""
+        key = []
+        for disease in query_results[:3]:
+            spec = disease.get('specialty')
+            if isinstance(spec, dict):
+                spec = (spec.get('specialty', 'N/A'), spec.get('department', 'N/A'), spec.get('location', 'N/A'))
+            else:
+                spec = None
+            key.append((
+                disease['name'],
+                disease.get('match_percentage', 0),
+                tuple(disease.get('symptoms', [])[:5]),
+                tuple(disease.get('matched_symptoms', [])),
+                disease.get('urgency', 'moyen'),
+                spec,
+                tuple((disease.get('precautions') or [])[:3])
+            ))
+        return tuple(key)
+    
+    def _format_context(self, query_results: List[Dict]) -> str:
+        """Render the top 3 query results as LLM context"""
         context_parts = []
         
         for i, disease in enumerate(query_results[:3], 1):  # Top 3 matches
-            disease_info = f"""
-Maladie #{i}: {disease['name']}
-- Score de correspondance: {disease.get('match_percentage', 0):.1f}%
-- Symptômes associés: {', '.join(disease.get('symptoms', [])[:5])}
-- Symptômes concordants: {', '.join(disease.get('matched_symptoms', []))}
-- Niveau d'urgence: {disease.get('urgency', 'moyen')}
-"""
+            lines = [DISEASE_TEMPLATE.format(
+                rank=i,
+                name=disease['name'],
+                match_percentage=disease.get('match_percentage', 0),
+                symptoms=', '.join(disease.get('symptoms', [])[:5]),
+                matched_symptoms=', '.join(disease.get('matched_symptoms', [])),
+                urgency=disease.get('urgency', 'moyen')
+            )]
             
-            # Add specialty info if available
-            if 'specialty' in disease and disease['specialty']:
-                spec = disease['specialty']
-                if isinstance(spec, dict):
-                    disease_info += f"- Spécialité recommandée: {spec.get('specialty', 'N/A')}\n"
-                    disease_info += f"- Département: {spec.get('department', 'N/A')}\n"
-                    disease_info += f"- Localisation: {spec.get('location', 'N/A')}\n"
+            # Add specialty info if available (missing fields -> N/A)
+            spec = disease.get('specialty')
+            if spec and isinstance(spec, dict):
+                lines.append(SPECIALTY_TEMPLATE.format_map(defaultdict(lambda: 'N/A', spec)))
             
             # Add precautions if available
-            if 'precautions' in disease and disease['precautions']:
+            if disease.get('precautions'):
                 precautions = disease['precautions'][:3]  # Top 3 precautions
-                disease_info += f"- Précautions: {', '.join(precautions)}\n"
+                lines.append(f"- Précautions: {', '.join(precautions)}\n")
             
-            context_parts.append(disease_info)
+            context_parts.append("".join(lines))
         
         return "\n".join(context_parts)
     
+    def _build_prompt(
+        self,
+        user_input: str,
+        query_results: List[Dict],
+        lang: str,
+        history: str = ""
+    ) -> str:
+        """
+        Build the complete prompt sent to the LLM
+        
+        Args:
+            user_input: User's message
+            query_results: Results from SPARQL query
+            lang: Response language
+            history: Formatted conversation history
+            
+        Returns:
+            Prompt string
+        """
+        # Format context from query results
+        context = self.format_context(query_results)
+        
+        # Create the complete prompt
+        return self._prompt_template(lang).format(
+            context=context,
+            history=history,
+            user_input=user_input
+        )
+    
+    @classmethod
+    @lru_cache(maxsize=4)
+    def _prompt_template(cls, language: str) -> str:
+        """Prompt template of a language, with its system prompt already filled in"""
+        system_prompt = cls._get_system_prompt(language)
+        escaped = system_prompt.replace('{', '{{').replace('}', '}}')
+        template = PROMPT_TEMPLATES['fr' if language == 'fr' else 'en']
+        return template.replace('{system_prompt}', escaped)
+    
+    def _format_history(self) -> str:
+        """Format the last 3 exchanges of the conversation"""
+        tail = islice(self.conversation_history, max(0, len(self.conversation_history) - 6), None)
+        return "\n".join([
+            f"{'Patient' if i % 2 == 0 else 'MedBot'}: {msg}"
+            for i, msg in enumerate(tail)  # Last 3 exchanges
+        ])
+    
+    def _record_exchange(self, user_input: str, response: str):
+        """Append a user message and its response to the history"""
+        self.conversation_history.append(user_input)
+        self.conversation_history.append(response)
+    
+    def _cached_response(self, prompt: str) -> Optional[str]:
+        """Response already generated for this prompt and these settings (None if none)"""
+        if self.response_cache is None:
+            return None
+        hit = self.response_cache.lookup(prompt, self._cache_key)
+        return hit[0].text if hit else None
+    
+    def _cache_response(self, prompt: str, response: str):
+        """Store a generated response in the LLM response cache"""
+        if self.response_cache is not None:
+            self.response_cache.update(prompt, self._cache_key, [Generation(text=response)])
+    
     def generate_response(
         self,
         user_input: str,
@@ -168,52 +362,116 @@ Maladie #{i}: {disease['name']}
             return self._fallback_response(query_results, language or self.language)
         
         lang = language or self.language
+        full_prompt = self._build_prompt(user_input, query_results, lang, self._format_history())
         
-        # Format context from query results
-        context = self.format_context(query_results)
-        
-        # Format conversation history
-        history = "\n".join([
-            f"{'Patient' if i % 2 == 0 else 'MedBot'}: {msg}"
-            for i, msg in enumerate(self.conversation_history[-6:])  # Last 3 exchanges
-        ])
-        
-        # Create the complete prompt
-        system_prompt = self._get_system_prompt(lang)
-        
-        if lang == "fr":
-            full_prompt = f"""{system_prompt}
-
-Contexte du Graphe de Connaissances:
-{context}
-
-Historique de conversation:
-{history}
-
-Patient: {user_input}
-
-Assistant MedBot:"""
-        else:
-            full_prompt = f"""{system_prompt}
-
-Knowledge Graph Context:
-{context}
-
-Conversation History:
-{history}
-
-Patient: {user_input}
-
-MedBot Assistant:"""
+        cached = self._cached_response(full_prompt)
+        if cached is not None:
+            logger.info("✓ Response served from LLM cache")
+            self._record_exchange(user_input, cached)
+            return cached
         
         try:
             # Generate response
             logger.info("Generating LLM response...")
             response = self.llm.invoke(full_prompt)
+            self._cache_response(full_prompt, response)
             
             # Add to conversation history
-            self.conversation_history.append(user_input)
-            self.conversation_history.append(response)
+            self._record_exchange(user_input, response)
+            
+            logger.info("✓ Response generated")
+            return response
+            
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            return self._fallback_response(query_results, lang)
+    
+    def generate_response_stream(
+        self,
+        user_input: str,
+        query_results: List[Dict],
+        language: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Generate a response using RAG, yielding it chunk by chunk as the LLM
+        produces it (the complete response is added to the history at the end)
+        
+        Args:
+            user_input: User's message
+            query_results: Results from SPARQL query
+            language: Response language
+            
+        Yields:
+            Response chunks
+        """
+        lang = language or self.language
+        
+        if self.llm is None:
+            yield self._fallback_response(query_results, lang)
+            return
+        
+        full_prompt = self._build_prompt(user_input, query_results, lang, self._format_history())
+        
+        cached = self._cached_response(full_prompt)
+        if cached is not None:
+            logger.info("✓ Response served from LLM cache")
+            self._record_exchange(user_input, cached)
+            yield cached
+            return
+        
+        chunks = []
+        try:
+            logger.info("Streaming LLM response...")
+            for chunk in self.llm.stream(full_prompt):
+                chunks.append(chunk)
+                yield chunk
+        except Exception as e:
+            logger.error(f"Error generating response: {e}")
+            if not chunks:
+                yield self._fallback_response(query_results, lang)
+            return
+        
+        response = "".join(chunks)
+        self._record_exchange(user_input, response)
+        self._cache_response(full_prompt, response)
+        
+        logger.info("✓ Response generated")
+    
+    async def agenerate_response(
+        self,
+        user_input: str,
+        query_results: List[Dict],
+        language: Optional[str] = None
+    ) -> str:
+        """
+        Async variant of generate_response (does not block the event loop)
+        
+        Args:
+            user_input: User's message
+            query_results: Results from SPARQL query
+            language: Response language
+            
+        Returns:
+            Generated response
+        """
+        if self.llm is None:
+            return self._fallback_response(query_results, language or self.language)
+        
+        lang = language or self.language
+        full_prompt = self._build_prompt(user_input, query_results, lang, self._format_history())
+        
+        cached = self._cached_response(full_prompt)
+        if cached is not None:
+            logger.info("✓ Response served from LLM cache")
+            self._record_exchange(user_input, cached)
+            return cached
+        
+        try:
+            logger.info("Generating LLM response (async)...")
+            response = await self.llm.ainvoke(full_prompt)
+            self._cache_response(full_prompt, response)
+            
+            self._record_exchange(user_input, response)
             
             logger.info("✓ Response generated")
             return response
@@ -222,6 +480,59 @@ MedBot Assistant:"""
             logger.error(f"Error generating response: {e}")
             return self._fallback_response(query_results, lang)
     
+    async def agenerate_batch(self, requests: List[Dict]) -> List[str]:
+        """
+        Generate responses for independent requests concurrently
+        
+        Prompts are sent in parallel (at most OLLAMA_NUM_PARALLEL at a time) so
+        that Ollama can batch them. Requests are stateless: the conversation
+        history is neither used nor updated.
+        
+        Args:
+            requests: Dicts with 'user_input', 'query_results' and optional 'language'
+            
+        Returns:
+            One response per request, in the same order
+        """
+        langs = [req.get('language') or self.language for req in requests]
+        
+        if self.llm is None:
+            return [
+                self._fallback_response(req['query_results'], lang)
+                for req, lang in zip(requests, langs)
+            ]
+        
+        semaphore = asyncio.Semaphore(self.num_parallel)
+        
+        async def run(prompt: str) -> str:
+            cached = self._cached_response(prompt)
+            if cached is not None:
+                return cached
+            async with semaphore:
+                response = await self.llm.ainvoke(prompt)
+            self._cache_response(prompt, response)
+            return response
+        
+        prompts = [
+            self._build_prompt(req['user_input'], req['query_results'], lang)
+            for req, lang in zip(requests, langs)
+        ]
+        logger.info(f"Generating {len(prompts)} LLM responses concurrently...")
+        results = await asyncio.gather(*[run(p) for p in prompts], return_exceptions=True)
+        
+        responses = []
+        for req, lang, result in zip(requests, langs, results):
+            if isinstance(result, Exception):
+                logger.error(f"Error generating response: {result}")
+                responses.append(self._fallback_response(req['query_results'], lang))
+            else:
+                responses.append(result)
+        return responses
+    
+    def generate_batch(self, requests: List[Dict]) -> List[str]:
+        """Synchronous wrapper around agenerate_batch (CLI, tests)"""
+        return asyncio.run(self.agenerate_batch(requests))
+    
     def _fallback_response(self, query_results: List[Dict], language: str = "fr") -> str:
         """
         Generate a simple response without LLM (fallback)
@@ -295,14 +606,28 @@ If your symptoms are severe or worsening, don't hesitate to go to the emergency
         
         return response
     
+    def close(self):
+        """Close the pooled HTTP connections of the synchronous Ollama client"""
+        # OllamaLLM does not expose its clients: skip them if that changes
+        client = getattr(self.llm, '_client', None)
+        if client is not None:
+            client.close()
+    
+    async def aclose(self):
+        """Close the pooled HTTP connections of both Ollama clients"""
+        self.close()
+        async_client = getattr(self.llm, '_async_client', None)
+        if async_client is not None:
+            await async_client.close()
+    
     def reset_conversation(self):
         """Reset conversation history"""
-        self.conversation_history = []
+        self.conversation_history.clear()
         logger.info("Conversation history reset")
     
     def get_conversation_history(self) -> List[str]:
         """Get the conversation history"""
-        return self.conversation_history.copy()
+        return list(self.conversation_history)
 
 
 # Test function
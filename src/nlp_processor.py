@@ -3,10 +3,13 @@ NLP Processor for MedBot
 Extracts and normalizes medical symptoms from user input (French and English)
 """
 
-import spacy
-import json
+import ahocorasick
+import mmap
+import orjson
+import unicodedata
 from typing import List, Dict, Tuple, Optional
 from pathlib import Path
+from functools import lru_cache
 import logging
 import os
 
@@ -14,53 +17,88 @@ import os
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# spaCy model of each language (noun chunks only need the parser and tagger)
+SPACY_MODELS = {'fr': 'fr_core_news_sm', 'en': 'en_core_web_sm'}
+DISABLED_PIPES = ["ner", "lemmatizer"]
+
+
+@lru_cache(maxsize=None)
+def _get_nlp(language: str):
+    """
+    Load the spaCy model of a language on first use, shared by every extractor
+    
+    Returns:
+        The spaCy pipeline, or None when the model is not installed
+    """
+    import spacy
+    
+    model = SPACY_MODELS[language]
+    try:
+        logger.info(f"Loading spaCy model {model}...")
+        nlp = spacy.load(model, disable=DISABLED_PIPES)
+        logger.info(f"✓ {model} loaded")
+        return nlp
+    except OSError:
+        logger.warning(f"{model} not found. Download with: python -m spacy download {model}")
+        return None
+
+
+# Ligatures have no NFKD decomposition: spelled out before stripping accents
+_LIGATURES = str.maketrans({'œ': 'oe', 'Œ': 'OE', 'æ': 'ae', 'Æ': 'AE', 'ß': 'ss', 'ẞ': 'SS'})
+
+
+def fold_accents(text: str) -> str:
+    """Lowercase and strip accents (ligatures spelled out, combining marks dropped)"""
+    decomposed = unicodedata.normalize('NFKD', text.translate(_LIGATURES))
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+# Common French words used for language detection
+FRENCH_WORDS = frozenset({
+    'je', 'tu', 'il', 'elle', 'nous', 'vous', 'ils', 'elles',
+    'le', 'la', 'les', 'de', 'du', 'des', 'un', 'une',
+    'ai', 'as', 'avons', 'suis', 'est', 'sont'
+})
+
 
 class SymptomExtractor:
     """Extract medical symptoms from natural language text"""
     
-    def __init__(self, data_path: Optional[str] = None):
+    def __init__(self, data_path: Optional[str] = None, enable_noun_chunks: bool = False):
         """
         Initialize the symptom extractor
         
         Args:
             data_path: Path to consolidated_medical_data.json
+            enable_noun_chunks: Also match noun chunks with spaCy (Method 3), the
+                model of a language being loaded on first use. Off by default:
+                the keyword automaton already finds every known symptom,
+                without the cost of a parse
         """
-        self.nlp_fr = None
-        self.nlp_en = None
+        self.enable_noun_chunks = enable_noun_chunks
         self.symptoms_dict = {}
         self.symptom_synonyms = {}
         
+        # Keyword automaton (built with the dictionaries): every known symptom
+        # and synonym is found in a single pass over the text
+        self._automaton = ahocorasick.Automaton()
+        self._keyword_targets: List[Tuple[str, bool]] = []
+        
         # Load data
         if data_path is None:
             data_path = os.getenv('DATA_PATH', 'data/processed/consolidated_medical_data.json')
         
         self._load_medical_data(data_path)
-        self._load_nlp_models()
         self._build_symptom_dictionaries()
         
-    def _load_nlp_models(self):
-        """Load spaCy models for French and English"""
-        try:
-            logger.info("Loading spaCy French model...")
-            self.nlp_fr = spacy.load("fr_core_news_sm")
-            logger.info("✓ French model loaded")
-        except OSError:
-            logger.warning("French model not found. Download with: python -m spacy download fr_core_news_sm")
-            self.nlp_fr = None
-            
-        try:
-            logger.info("Loading spaCy English model...")
-            self.nlp_en = spacy.load("en_core_web_sm")
-            logger.info("✓ English model loaded")
-        except OSError:
-            logger.warning("English model not found. Download with: python -m spacy download en_core_web_sm")
-            self.nlp_en = None
-    
     def _load_medical_data(self, data_path: str):
         """Load medical data from consolidated JSON"""
         try:
-            with open(data_path, 'r', encoding='utf-8') as f:
-                self.medical_data = json.load(f)
+            # orjson parses the mapped file directly (no intermediate read buffer)
+            with open(data_path, 'rb') as f, \
+                    mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+                    memoryview(mm) as view:
+                self.medical_data = orjson.loads(view)
             logger.info(f"✓ Loaded medical data from {data_path}")
         except FileNotFoundError:
             logger.error(f"Medical data file not found: {data_path}")
@@ -90,12 +128,19 @@ class SymptomExtractor:
         # Build synonym mappings (French <-> English)
         self._build_symptom_synonyms()
         
+        self._build_automaton()
+        
         logger.info(f"✓ Built dictionary with {len(self.symptoms_dict)} unique symptoms")
     
     def _build_symptom_synonyms(self):
-        """Build French-English synonym mappings for common symptoms"""
+        """
+        Build French-English synonym mappings for common symptoms
+        
+        Keys are accent-folded (matched against the folded text), so each
+        word is listed once and unaccented spellings match as well
+        """
         # Common medical translations
-        self.symptom_synonyms = {
+        synonyms = {
             # French -> English
             "fièvre": "fever",
             "toux": "cough",
@@ -110,19 +155,14 @@ class SymptomExtractor:
             "vomissement": "vomiting",
             "vomissements": "vomiting",
             "diarrhée": "diarrhea",
-            "diarrhee": "diarrhea",  # without accent
             "déshydraté": "dehydration",
-            "deshydrate": "dehydration",  # without accent
             "déshydratation": "dehydration",
             "constipation": "constipation",
             "éruption cutanée": "skin_rash",
-            "eruption cutanee": "skin_rash",  # without accents
             "démangeaison": "itching",
-            "demangeaison": "itching",  # without accent
             "démangeaisons": "itching",
             "essoufflement": "breathlessness",
             "difficulté à respirer": "breathlessness",
-            "difficulte a respirer": "breathlessness",  # without accents
             "douleur thoracique": "chest_pain",
             "douleur abdominale": "stomach_pain",
             "mal de ventre": "stomach_pain",
@@ -144,10 +184,64 @@ class SymptomExtractor:
             "dehydrated": "dehydration",
             "diarrhea": "diarrhoea",  # American vs British spelling
         }
+        
+        self.symptom_synonyms = {fold_accents(k): v for k, v in synonyms.items()}
+    
+    def _build_automaton(self):
+        """
+        Index every keyword (symptom key, symptom name, synonym) in an
+        Aho-Corasick automaton
+        
+        Each keyword maps to the ids of the targets it reveals; ids follow the
+        dictionary order (symptoms first, then synonyms) so that results keep
+        the order of the former dictionary scans
+        """
+        self._keyword_targets = []
+        keywords: Dict[str, List[int]] = {}
+        
+        for symptom_key, symptom_value in self.symptoms_dict.items():
+            target_id = len(self._keyword_targets)
+            self._keyword_targets.append((symptom_key, False))
+            for keyword in {fold_accents(symptom_key), fold_accents(symptom_value)}:
+                keywords.setdefault(keyword, []).append(target_id)
+        
+        for synonym, target in self.symptom_synonyms.items():
+            normalized = self._normalize_symptom_name(target)
+            if normalized in self.symptoms_dict:
+                target_id = len(self._keyword_targets)
+                self._keyword_targets.append((normalized, True))
+                keywords.setdefault(synonym, []).append(target_id)
+        
+        self._automaton = ahocorasick.Automaton()
+        for keyword, target_ids in keywords.items():
+            if keyword:
+                self._automaton.add_word(keyword, tuple(target_ids))
+        if keywords:
+            self._automaton.make_automaton()
+    
+    def _match_keywords(self, text: str) -> List[Tuple[str, bool]]:
+        """
+        Find every known symptom and synonym contained in a text (accents
+        and case are ignored)
+        
+        Returns:
+            (normalized symptom, found through a synonym) pairs, in dictionary order
+        """
+        if self._automaton.kind != ahocorasick.AHOCORASICK:
+            return []
+        
+        found = set()
+        for _, target_ids in self._automaton.iter(fold_accents(text)):
+            found.update(target_ids)
+        
+        return [self._keyword_targets[i] for i in sorted(found)]
+    
+    # Spaces and hyphens -> underscores, in a single translate pass
+    _NORM_TABLE = str.maketrans({' ': '_', '-': '_'})
     
     def _normalize_symptom_name(self, symptom: str) -> str:
         """Normalize symptom name (lowercase, replace spaces with underscores)"""
-        return symptom.lower().strip().replace(' ', '_').replace('-', '_')
+        return symptom.lower().strip().translate(self._NORM_TABLE)
     
     def detect_language(self, text: str) -> str:
         """
@@ -159,14 +253,20 @@ class SymptomExtractor:
         Returns:
             'fr' or 'en'
         """
-        french_words = {'je', 'tu', 'il', 'elle', 'nous', 'vous', 'ils', 'elles', 
-                       'le', 'la', 'les', 'de', 'du', 'des', 'un', 'une',
-                       'ai', 'as', 'avons', 'suis', 'est', 'sont'}
-        
-        words = set(text.lower().split())
-        french_count = len(words & french_words)
+        return self._detect_language(text.lower())
+    
+    @staticmethod
+    def _detect_language(text_lower: str) -> str:
+        """detect_language on an already lowercased text"""
+        # Stop as soon as two distinct French words have been seen
+        seen = set()
+        for word in text_lower.split():
+            if word in FRENCH_WORDS and word not in seen:
+                seen.add(word)
+                if len(seen) >= 2:
+                    return 'fr'
         
-        return 'fr' if french_count >= 2 else 'en'
+        return 'en'
     
     def extract_symptoms(self, text: str, language: Optional[str] = None) -> List[Dict[str, any]]:
         """
@@ -179,73 +279,120 @@ class SymptomExtractor:
         Returns:
             List of dictionaries with 'symptom', 'normalized', 'confidence'
         """
+        # Lowercased once, shared by every step
+        text_lower = text.lower()
+        
         if language is None:
-            language = self.detect_language(text)
+            language = self._detect_language(text_lower)
         
         logger.info(f"Extracting symptoms from text (language: {language})")
         
-        # Get appropriate NLP model
-        nlp = self.nlp_fr if language == 'fr' else self.nlp_en
+        # Get appropriate NLP model (only needed for noun chunks)
+        nlp = None
+        if self.enable_noun_chunks:
+            nlp = _get_nlp('fr' if language == 'fr' else 'en')
+            
+            if nlp is None:
+                logger.warning(f"NLP model for {language} not available, using fallback")
+                return self._fallback_extraction(text_lower)
         
-        if nlp is None:
-            logger.warning(f"NLP model for {language} not available, using fallback")
-            return self._fallback_extraction(text)
+        doc = nlp(text_lower) if nlp is not None else None
+        result = self._extract(text_lower, doc)
         
-        # Process text with spaCy
-        doc = nlp(text.lower())
+        logger.info(f"✓ Extracted {len(result)} symptoms: {[s['symptom'] for s in result]}")
         
-        extracted_symptoms = []
+        return result
+    
+    def extract_symptoms_batch(
+        self,
+        texts: List[str],
+        language: Optional[str] = None
+    ) -> List[List[Dict[str, any]]]:
+        """
+        Extract symptoms from several texts (batch evaluation, concurrent users)
         
-        # Method 1: Look for known symptoms in text
-        for symptom_key, symptom_value in self.symptoms_dict.items():
-            if symptom_key in text.lower() or symptom_value.lower() in text.lower():
-                extracted_symptoms.append({
-                    'symptom': symptom_value,
-                    'normalized': symptom_key,
-                    'confidence': 0.9,
-                    'method': 'exact_match'
-                })
+        With noun chunks enabled, the texts of each language go through
+        nlp.pipe in batches instead of one spaCy call per text
         
-        # Method 2: Check synonyms
-        for synonym, target in self.symptom_synonyms.items():
-            if synonym in text.lower():
-                normalized = self._normalize_symptom_name(target)
-                if normalized in self.symptoms_dict:
-                    extracted_symptoms.append({
-                        'symptom': self.symptoms_dict[normalized],
-                        'normalized': normalized,
-                        'confidence': 0.85,
-                        'method': 'synonym_match'
-                    })
+        Args:
+            texts: User input texts
+            language: Language code for every text, auto-detected per text if None
+            
+        Returns:
+            One result list per text (same format as extract_symptoms)
+        """
+        lowered = [text.lower() for text in texts]
+        languages = [language or self._detect_language(text) for text in lowered]
+        docs = [None] * len(texts)
         
-        # Method 3: Use noun chunks (potential symptoms)
-        for chunk in doc.noun_chunks:
-            chunk_text = chunk.text.lower()
-            normalized = self._normalize_symptom_name(chunk_text)
+        if self.enable_noun_chunks:
+            by_language: Dict[str, List[int]] = {}
+            for i, lang in enumerate(languages):
+                by_language.setdefault('fr' if lang == 'fr' else 'en', []).append(i)
             
-            # Check if it's a known symptom
-            if normalized in self.symptoms_dict:
-                extracted_symptoms.append({
-                    'symptom': self.symptoms_dict[normalized],
-                    'normalized': normalized,
-                    'confidence': 0.7,
-                    'method': 'noun_chunk'
-                })
+            for lang, indices in by_language.items():
+                nlp = _get_nlp(lang)
+                if nlp is None:
+                    logger.warning(f"NLP model for {lang} not available, using fallback")
+                    continue
+                batch = (lowered[i] for i in indices)
+                for i, doc in zip(indices, nlp.pipe(batch, batch_size=64)):
+                    docs[i] = doc
         
-        # Remove duplicates (keep highest confidence)
-        unique_symptoms = {}
-        for symptom in extracted_symptoms:
-            key = symptom['normalized']
-            if key not in unique_symptoms or symptom['confidence'] > unique_symptoms[key]['confidence']:
-                unique_symptoms[key] = symptom
+        results = []
+        for text, doc in zip(lowered, docs):
+            if self.enable_noun_chunks and doc is None:
+                results.append(self._fallback_extraction(text))
+            else:
+                results.append(self._extract(text, doc))
         
-        result = list(unique_symptoms.values())
+        logger.info(f"✓ Extracted symptoms from {len(texts)} texts")
+        return results
+    
+    def _extract(self, text: str, doc=None) -> List[Dict[str, any]]:
+        """
+        Run the extraction methods on a text and keep the best match per symptom
         
-        # Sort by confidence
-        result.sort(key=lambda x: x['confidence'], reverse=True)
+        Args:
+            text: Lowercased user input text
+            doc: spaCy doc of the text (noun chunks), if any
+        """
+        # (normalized, confidence, method) of every match
+        matches: List[Tuple[str, float, str]] = []
         
-        logger.info(f"✓ Extracted {len(result)} symptoms: {[s['symptom'] for s in result]}")
+        # Methods 1 & 2: known symptoms (exact match) and synonyms, in one pass
+        for normalized, via_synonym in self._match_keywords(text):
+            if via_synonym:
+                matches.append((normalized, 0.85, 'synonym_match'))
+            else:
+                matches.append((normalized, 0.9, 'exact_match'))
         
+        # Method 3: Use noun chunks (potential symptoms)
+        if doc is not None:
+            for chunk in doc.noun_chunks:
+                normalized = self._normalize_symptom_name(chunk.text.lower())
+                
+                # Check if it's a known symptom
+                if normalized in self.symptoms_dict:
+                    matches.append((normalized, 0.7, 'noun_chunk'))
+        
+        # Sort by confidence (stable), then keep the first match of each symptom
+        matches.sort(key=lambda m: -m[1])
+        return self._materialize(matches)
+    
+    def _materialize(self, matches: List[Tuple[str, float, str]]) -> List[Dict[str, any]]:
+        """Build the result dicts, keeping only the first match of each symptom"""
+        seen = set()
+        result = []
+        for normalized, confidence, method in matches:
+            if normalized not in seen:
+                seen.add(normalized)
+                result.append({
+                    'symptom': self.symptoms_dict[normalized],
+                    'normalized': normalized,
+                    'confidence': confidence,
+                    'method': method
+                })
         return result
     
     def _fallback_extraction(self, text: str) -> List[Dict[str, any]]:
@@ -253,39 +400,14 @@ class SymptomExtractor:
         Fallback extraction when NLP models are not available
         Simple keyword matching
         """
-        extracted_symptoms = []
-        text_lower = text.lower()
-        
-        # Check all symptoms
-        for symptom_key, symptom_value in self.symptoms_dict.items():
-            if symptom_key in text_lower or symptom_value.lower() in text_lower:
-                extracted_symptoms.append({
-                    'symptom': symptom_value,
-                    'normalized': symptom_key,
-                    'confidence': 0.8,
-                    'method': 'keyword_match'
-                })
-        
-        # Check synonyms
-        for synonym, target in self.symptom_synonyms.items():
-            if synonym in text_lower:
-                normalized = self._normalize_symptom_name(target)
-                if normalized in self.symptoms_dict:
-                    extracted_symptoms.append({
-                        'symptom': self.symptoms_dict[normalized],
-                        'normalized': normalized,
-                        'confidence': 0.75,
-                        'method': 'synonym_keyword'
-                    })
+        # Check all symptoms and synonyms in one pass
+        matches = [
+            (normalized, 0.75, 'synonym_keyword') if via_synonym else (normalized, 0.8, 'keyword_match')
+            for normalized, via_synonym in self._match_keywords(text)
+        ]
         
         # Remove duplicates
-        unique_symptoms = {}
-        for symptom in extracted_symptoms:
-            key = symptom['normalized']
-            if key not in unique_symptoms:
-                unique_symptoms[key] = symptom
-        
-        return list(unique_symptoms.values())
+        return self._materialize(matches)
     
     def get_all_symptoms(self) -> List[str]:
         """Get list of all known symptoms"""
@@ -3,12 +3,22 @@ SPARQL Query Engine for MedBot
 Queries the medical knowledge graph to find diseases, specialties, and recommendations
 """
 
-from rdflib import Graph, Namespace, RDF, RDFS, Literal
+from rdflib import Graph, Namespace, RDF, RDFS, URIRef
+from rdflib.plugin import PluginException
+from rdflib.plugins.sparql import prepareQuery
 from typing import List, Dict, Optional, Tuple
+from collections import OrderedDict
+import numpy as np
+import heapq
 import logging
 import os
+import sys
+import threading
+from operator import itemgetter
 from pathlib import Path
 
+import kg_cache
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -16,43 +26,343 @@ logger = logging.getLogger(__name__)
 # Define namespaces
 MED = Namespace("http://medbot.org/ontology#")
 
+# Plain-string prefixes: stores such as Oxigraph reject rdflib's DefinedNamespace
+INIT_NS = {'med': str(MED), 'rdf': str(RDF)}
+
+# Ranking weight of each urgency level (unknown levels rank as medium)
+URGENCY_PRIORITY = {'high': 3, 'medium': 2, 'low': 1}
+
+# Maximum number of symptom queries whose ranked results are kept in memory
+QUERY_CACHE_SIZE = 1024
+
+# rdflib store backend ("default" = in-memory, "Oxigraph" needs oxrdflib)
+RDF_STORE = os.getenv('RDF_STORE', 'default')
+
+# SPARQL queries, parsed once at import (values are passed via initBindings)
+_Q_DETAILS = prepareQuery("""
+    SELECT ?disease ?specialtyName ?department ?location ?precaution
+    WHERE {
+        ?disease rdf:type med:Disease .
+        OPTIONAL {
+            ?disease med:treatedBy ?specialty .
+            ?specialty med:specialtyName ?specialtyName .
+            OPTIONAL {
+                ?specialty med:belongsToDepartment ?dept .
+                ?dept med:departmentName ?department .
+                OPTIONAL { ?dept med:location ?location }
+            }
+        }
+        OPTIONAL { ?disease med:hasPrecaution ?precaution }
+    }
+""", initNs=INIT_NS)
+
+_Q_COUNT_INSTANCES = prepareQuery("""
+    SELECT ?class (COUNT(DISTINCT ?instance) as ?count)
+    WHERE {
+        VALUES ?class { med:Disease med:Symptom med:MedicalSpecialty med:Department }
+        ?instance rdf:type ?class .
+    }
+    GROUP BY ?class
+""", initNs=INIT_NS)
+
+# Statistics key of each counted class
+STAT_CLASSES = {
+    str(MED.Disease): 'diseases',
+    str(MED.Symptom): 'symptoms',
+    str(MED.MedicalSpecialty): 'specialties',
+    str(MED.Department): 'departments'
+}
+
+_Q_SPECIALTY = prepareQuery("""
+    SELECT ?specialtyName ?department ?location
+    WHERE {
+        ?disease med:treatedBy ?specialty .
+        ?specialty med:specialtyName ?specialtyName .
+        OPTIONAL {
+            ?specialty med:belongsToDepartment ?dept .
+            ?dept med:departmentName ?department .
+            OPTIONAL { ?dept med:location ?location }
+        }
+    }
+""", initNs=INIT_NS)
+
+_Q_PRECAUTIONS = prepareQuery("""
+    SELECT ?precaution
+    WHERE {
+        ?disease med:hasPrecaution ?precaution .
+    }
+""", initNs=INIT_NS)
+
+_Q_SPECIALTIES = prepareQuery("""
+    SELECT DISTINCT ?specialtyName
+    WHERE {
+        ?specialty rdf:type med:MedicalSpecialty .
+        ?specialty med:specialtyName ?specialtyName .
+    }
+    ORDER BY ?specialtyName
+""", initNs=INIT_NS)
+
+_Q_DEPARTMENTS = prepareQuery("""
+    SELECT ?deptName ?location
+    WHERE {
+        ?dept rdf:type med:Department .
+        ?dept med:departmentName ?deptName .
+        OPTIONAL { ?dept med:location ?location }
+    }
+    ORDER BY ?deptName
+""", initNs=INIT_NS)
+
 
 class MedicalKnowledgeGraph:
     """Query the medical knowledge graph using SPARQL"""
     
-    def __init__(self, ontology_path: Optional[str] = None):
+    def __init__(self, ontology_path: Optional[str] = None, graph: Optional[Graph] = None):
         """
         Initialize the knowledge graph
         
         Args:
-            ontology_path: Path to medical_ontology.ttl file
+            ontology_path: Path to medical_ontology.nt (or .ttl) file
+            graph: Already loaded graph (on any store) to use instead of
+                parsing the ontology file
         """
-        self.graph = Graph()
+        self.graph = graph if graph is not None else self._create_graph()
         
         if ontology_path is None:
-            ontology_path = os.getenv('ONTOLOGY_PATH', 'data/ontology/medical_ontology.ttl')
+            ontology_path = os.getenv('ONTOLOGY_PATH', 'data/ontology/medical_ontology.nt')
         
         self.ontology_path = ontology_path
-        self._load_graph()
+        
+        # Symptom bitsets (filled by _build_index once the graph is loaded)
+        self._symptom_index: Dict[str, int] = {}
+        self._diseases: List[Dict] = []
+        self._disease_masks = np.zeros((0, 1), dtype=np.uint64)
+        self._disease_symptoms: Dict[str, frozenset] = {}
+        self._details: Dict[str, Dict] = {}
+        self._name_index: List[Tuple[str, Dict]] = []
+        
+        # Names of the symptoms attached to at least one disease
+        self.known_symptoms: frozenset = frozenset()
+        
+        # Ranked results of recent symptom queries (LRU, cleared on reload)
+        self._query_cache: "OrderedDict[tuple, List[Dict]]" = OrderedDict()
+        # The graph is shared by the app's sessions, which query it from several threads
+        self._query_cache_lock = threading.Lock()
+        
+        # Graph statistics, computed on first request (cleared on reload)
+        self._stats: Optional[Dict[str, int]] = None
+        
+        self._load_graph(preloaded=graph is not None)
         
         # Bind namespaces
         self.graph.bind("med", MED)
         self.graph.bind("rdf", RDF)
         self.graph.bind("rdfs", RDFS)
     
-    def _load_graph(self):
-        """Load the RDF graph from Turtle file"""
+    @staticmethod
+    def _create_graph() -> Graph:
+        """Create the graph on the configured store, falling back to memory"""
+        try:
+            return Graph(store=RDF_STORE)
+        except PluginException as e:
+            logger.warning(f"RDF store '{RDF_STORE}' unavailable ({e}), using in-memory store")
+            return Graph()
+    
+    def _resolve_source(self) -> Tuple[str, str]:
+        """
+        Pick the file to parse: the N-Triples sibling of a .ttl ontology is
+        preferred when it is at least as recent (much cheaper to parse)
+        
+        Returns:
+            (path, rdflib format)
+        """
+        path = Path(self.ontology_path)
+        if path.suffix == '.nt':
+            return str(path), 'nt'
+        
+        nt_path = path.with_suffix('.nt')
+        if nt_path.exists() and (not path.exists() or nt_path.stat().st_mtime >= path.stat().st_mtime):
+            return str(nt_path), 'nt'
+        
+        return str(path), 'turtle'
+    
+    def _load_graph(self, preloaded: bool = False):
+        """
+        Load the RDF graph from the N-Triples or Turtle file (or only index
+        it when it was handed over already loaded)
+        """
         try:
-            logger.info(f"Loading medical ontology from {self.ontology_path}")
-            self.graph.parse(self.ontology_path, format='turtle')
-            logger.info(f"✓ Loaded graph with {len(self.graph)} triples")
+            with self._query_cache_lock:
+                self._query_cache.clear()
+            self._stats = None
+            
+            if preloaded:
+                logger.info(f"Using preloaded graph with {len(self.graph)} triples")
+                self._build_index()
+                self._build_details()
+            else:
+                source, rdf_format = self._resolve_source()
+                if not self._load_cache(source):
+                    logger.info(f"Loading medical ontology from {source}")
+                    self.graph.parse(source, format=rdf_format)
+                    logger.info(f"✓ Loaded graph with {len(self.graph)} triples")
+                    self._build_index()
+                    self._build_details()
+                    self._save_cache(source)
+            
+            self.known_symptoms = frozenset(self._symptom_index)
+            
+            # Lowercased disease names for search_by_disease_name
+            self._name_index = [(disease['name'].lower(), disease) for disease in self._diseases]
         except FileNotFoundError:
             logger.error(f"Ontology file not found: {self.ontology_path}")
         except Exception as e:
             logger.error(f"Error loading graph: {e}")
     
+    def _cache_path(self, source: str) -> Path:
+        """
+        Cache entry of the ontology file, for this version of the module and
+        this store (the index order follows the store's iteration order)
+        """
+        return kg_cache.cache_path([source, __file__], type(self.graph.store).__name__)
+    
+    def _load_cache(self, source: str) -> bool:
+        """
+        Reload the triples and indexes cached by a previous run (unpickling
+        the triples is cheaper than parsing them, even from N-Triples)
+        
+        Returns:
+            True if the graph and its indexes were loaded
+        """
+        cache_path = self._cache_path(source)
+        cached = kg_cache.load(cache_path)
+        if cached is None:
+            return False
+        
+        (triples, self._symptom_index, self._diseases, self._disease_masks,
+         self._disease_symptoms, self._details) = cached
+        
+        graph = self.graph
+        graph.addN((s, p, o, graph) for s, p, o in triples)
+        logger.info(f"✓ Loaded graph with {len(graph)} triples and {len(self._diseases)} indexed diseases from {cache_path}")
+        return True
+    
+    def _save_cache(self, source: str):
+        """Cache the triples and indexes so the next start skips parsing and indexing"""
+        kg_cache.save(self._cache_path(source), (
+            list(self.graph), self._symptom_index, self._diseases, self._disease_masks,
+            self._disease_symptoms, self._details
+        ))
+    
+    def _build_index(self):
+        """
+        Precompute, by walking the triples once (no SPARQL):
+        - one symptom bitset per disease (one bit per known symptom), so that
+          matching a request is a vectorized popcount
+        - the symptom set of each disease
+        """
+        graph = self.graph
+        
+        # Symptom names and URIs are interned: the index dictionaries, symptom
+        # sets and result lists all share one string object per value
+        symptom_names = {}
+        for symptom, name in graph.subject_objects(MED.symptomName):
+            if symptom not in symptom_names:
+                symptom_names[symptom] = sys.intern(str(name))
+        
+        symptom_index = {}
+        diseases = {}
+        for disease_ref in graph.subjects(RDF.type, MED.Disease):
+            name = graph.value(disease_ref, MED.diseaseName)
+            disease_uri = sys.intern(str(disease_ref))
+            if name is None or disease_uri in diseases:
+                continue
+            
+            description = graph.value(disease_ref, MED.description)
+            urgency = str(graph.value(disease_ref, MED.urgencyLevel) or "medium")
+            disease = diseases[disease_uri] = {
+                'uri': disease_uri,
+                'name': str(name),
+                'description': str(description) if description else "",
+                'urgency': urgency,
+                'urgency_score': URGENCY_PRIORITY.get(urgency.lower(), 2),
+                'symptoms': []
+            }
+            
+            for symptom in graph.objects(disease_ref, MED.hasSymptom):
+                symptom_name = symptom_names.get(symptom)
+                if symptom_name is None:
+                    continue
+                if symptom_name not in disease['symptoms']:
+                    disease['symptoms'].append(symptom_name)
+                symptom_index.setdefault(symptom_name, len(symptom_index))
+        
+        n_words = max(1, -(-len(symptom_index) // 64))
+        masks = np.zeros((len(diseases), n_words), dtype=np.uint64)
+        for i, disease in enumerate(diseases.values()):
+            for symptom_name in disease['symptoms']:
+                self._set_bit(masks[i], symptom_index[symptom_name])
+        
+        self._symptom_index = symptom_index
+        self._diseases = list(diseases.values())
+        self._disease_masks = masks
+        self._disease_symptoms = {uri: frozenset(d['symptoms']) for uri, d in diseases.items()}
+        logger.info(f"✓ Indexed {len(self._diseases)} diseases over {len(symptom_index)} symptoms")
+    
+    def _build_details(self):
+        """
+        Materialize the details (specialty, department, precautions) of every
+        disease with a single whole-graph query, so get_disease_details is a
+        dictionary lookup
+        """
+        details = {
+            disease['uri']: {
+                'uri': disease['uri'],
+                'name': disease['name'],
+                'description': disease['description'],
+                'urgency': disease['urgency'],
+                'symptoms': disease['symptoms'],
+                'specialty': None,
+                'precautions': []
+            }
+            for disease in self._diseases
+        }
+        
+        for row in self.graph.query(_Q_DETAILS):
+            disease_details = details.get(str(row.disease))
+            if disease_details is None:
+                continue
+            
+            if disease_details['specialty'] is None and row.specialtyName is not None:
+                disease_details['specialty'] = {
+                    'specialty': str(row.specialtyName),
+                    'department': str(row.department) if row.department else "General",
+                    'location': str(row.location) if row.location else "Main Building"
+                }
+            
+            if row.precaution is not None and str(row.precaution) not in disease_details['precautions']:
+                disease_details['precautions'].append(str(row.precaution))
+        
+        self._details = details
+    
+    @staticmethod
+    def _set_bit(mask: np.ndarray, bit: int):
+        """Set a bit in a uint64 word array"""
+        mask[bit >> 6] |= np.uint64(1) << np.uint64(bit & 63)
+    
+    def _symptoms_mask(self, symptom_names: List[str]) -> np.ndarray:
+        """Bitset of the given symptoms (unknown symptoms are ignored)"""
+        mask = np.zeros(self._disease_masks.shape[1], dtype=np.uint64)
+        for name in symptom_names:
+            bit = self._symptom_index.get(name)
+            if bit is not None:
+                self._set_bit(mask, bit)
+        return mask
+    
     def get_graph_statistics(self) -> Dict[str, int]:
         """Get statistics about the knowledge graph"""
+        if self._stats is not None:
+            return dict(self._stats)
+        
         stats = {
             'total_triples': len(self.graph),
             'diseases': 0,
@@ -61,58 +371,20 @@ class MedicalKnowledgeGraph:
             'departments': 0
         }
         
-        # Count diseases
-        query = """
-        SELECT (COUNT(DISTINCT ?disease) as ?count)
-        WHERE {
-            ?disease rdf:type med:Disease .
-        }
-        """
-        result = list(self.graph.query(query, initNs={'med': MED, 'rdf': RDF}))
-        if result:
-            stats['diseases'] = int(result[0][0])
-        
-        # Count symptoms
-        query = """
-        SELECT (COUNT(DISTINCT ?symptom) as ?count)
-        WHERE {
-            ?symptom rdf:type med:Symptom .
-        }
-        """
-        result = list(self.graph.query(query, initNs={'med': MED, 'rdf': RDF}))
-        if result:
-            stats['symptoms'] = int(result[0][0])
-        
-        # Count specialties
-        query = """
-        SELECT (COUNT(DISTINCT ?specialty) as ?count)
-        WHERE {
-            ?specialty rdf:type med:MedicalSpecialty .
-        }
-        """
-        result = list(self.graph.query(query, initNs={'med': MED, 'rdf': RDF}))
-        if result:
-            stats['specialties'] = int(result[0][0])
-        
-        # Count departments
-        query = """
-        SELECT (COUNT(DISTINCT ?dept) as ?count)
-        WHERE {
-            ?dept rdf:type med:Department .
-        }
-        """
-        result = list(self.graph.query(query, initNs={'med': MED, 'rdf': RDF}))
-        if result:
-            stats['departments'] = int(result[0][0])
+        # Count the instances of every class in a single pass
+        for row in self.graph.query(_Q_COUNT_INSTANCES):
+            stats[STAT_CLASSES[str(row['class'])]] = int(row['count'])
         
-        return stats
+        self._stats = stats
+        return dict(stats)
     
-    def query_diseases_by_symptoms(self, symptom_names: List[str]) -> List[Dict]:
+    def query_diseases_by_symptoms(self, symptom_names: List[str], top_n: Optional[int] = None) -> List[Dict]:
         """
         Find diseases that match the given symptoms
         
         Args:
             symptom_names: List of symptom names (normalized)
+            top_n: Only return the top_n best matches (all matches if None)
             
         Returns:
             List of disease information dictionaries
@@ -121,120 +393,124 @@ class MedicalKnowledgeGraph:
             logger.warning("No symptoms provided for query")
             return []
         
-        logger.info(f"Querying diseases for symptoms: {symptom_names}")
+        # None of the symptoms belongs to a disease: skip the matching entirely
+        if self.known_symptoms.isdisjoint(symptom_names):
+            logger.info(f"✓ No known symptom in {symptom_names}, found 0 matching diseases")
+            return []
         
-        # Build SPARQL query
-        # We'll find all diseases that have at least one of the symptoms
-        symptom_filter = ", ".join([f'"{s}"' for s in symptom_names])
-        
-        query = f"""
-        SELECT DISTINCT ?disease ?diseaseName ?description ?urgency
-        WHERE {{
-            ?disease rdf:type med:Disease .
-            ?disease med:diseaseName ?diseaseName .
-            ?disease med:hasSymptom ?symptom .
-            ?symptom med:symptomName ?symptomName .
-            FILTER(?symptomName IN ({symptom_filter}))
-            OPTIONAL {{ ?disease med:description ?description }}
-            OPTIONAL {{ ?disease med:urgencyLevel ?urgency }}
-        }}
-        """
+        # Order matters (matched_symptoms follows it), so the key is not sorted
+        key = (tuple(symptom_names), top_n)
+        cache = self._query_cache
+        with self._query_cache_lock:
+            results = cache.get(key)
+            if results is not None:
+                cache.move_to_end(key)
+        if results is not None:
+            return self._copy_results(results)
+        
+        results = self._match_diseases(symptom_names, top_n)
+        
+        with self._query_cache_lock:
+            cache[key] = results
+            if len(cache) > QUERY_CACHE_SIZE:
+                cache.popitem(last=False)
+        return self._copy_results(results)
+    
+    @staticmethod
+    def _copy_results(results: List[Dict]) -> List[Dict]:
+        """Copy of cached results that callers can enrich/mutate freely"""
+        return [
+            {**disease, 'symptoms': list(disease['symptoms']), 'matched_symptoms': list(disease['matched_symptoms'])}
+            for disease in results
+        ]
+    
+    def _match_diseases(self, symptom_names: List[str], top_n: Optional[int] = None) -> List[Dict]:
+        """Rank the diseases sharing at least one of the given symptoms"""
+        logger.info(f"Querying diseases for symptoms: {symptom_names}")
         
         results = []
+        
         try:
-            qres = self.graph.query(query, initNs={'med': MED, 'rdf': RDF})
+            # Number of user symptoms found in each disease, for all diseases at once
+            user_mask = self._symptoms_mask(symptom_names)
+            match_counts = np.bitwise_count(self._disease_masks & user_mask).sum(axis=1)
             
-            for row in qres:
-                disease_uri = str(row.disease)
-                disease_name = str(row.diseaseName) if row.diseaseName else "Unknown"
-                description = str(row.description) if row.description else ""
-                urgency = str(row.urgency) if row.urgency else "medium"
-                
-                # Get all symptoms for this disease
-                disease_symptoms = self._get_disease_symptoms(disease_uri)
-                
-                # Calculate match score
-                match_score = self._calculate_match_score(symptom_names, disease_symptoms)
-                
-                results.append({
-                    'uri': disease_uri,
-                    'name': disease_name,
-                    'description': description,
-                    'urgency': urgency,
-                    'symptoms': disease_symptoms,
-                    'matched_symptoms': [s for s in symptom_names if s in disease_symptoms],
-                    'match_score': match_score,
-                    'match_percentage': match_score * 10  # Score is 0-10, percentage is 0-100
-                })
+            # Percentage of user symptoms that matched, scored out of 10
+            match_scores = np.minimum(match_counts / len(symptom_names) * 10, 10.0).tolist()
             
-            # Rank by match score
-            results = self.rank_diseases(results, symptom_names)
+            for i in np.flatnonzero(match_counts).tolist():
+                disease = self._diseases[i]
+                disease_symptoms = self._disease_symptoms[disease['uri']]
+                results.append(self._result_entry(
+                    disease,
+                    [s for s in symptom_names if s in disease_symptoms],
+                    match_scores[i]
+                ))
             
             logger.info(f"✓ Found {len(results)} matching diseases")
             
+            # Rank by match score
+            results = self.rank_diseases(results, symptom_names, top_n)
+            
         except Exception as e:
-            logger.error(f"Error executing SPARQL query: {e}")
+            logger.error(f"Error matching symptoms: {e}")
         
         return results
     
-    def _get_disease_symptoms(self, disease_uri: str) -> List[str]:
-        """Get all symptoms for a specific disease"""
-        query = f"""
-        SELECT ?symptomName
-        WHERE {{
-            <{disease_uri}> med:hasSymptom ?symptom .
-            ?symptom med:symptomName ?symptomName .
-        }}
-        """
-        
-        symptoms = []
-        try:
-            qres = self.graph.query(query, initNs={'med': MED})
-            symptoms = [str(row.symptomName) for row in qres]
-        except Exception as e:
-            logger.error(f"Error getting symptoms for disease: {e}")
-        
-        return symptoms
+    @staticmethod
+    def _result_entry(disease: Dict, matched_symptoms: List[str], match_score: float) -> Dict:
+        """Result dictionary of a disease matching some of the user symptoms"""
+        return {
+            'uri': disease['uri'],
+            'name': disease['name'],
+            'description': disease['description'],
+            'urgency': disease['urgency'],
+            'urgency_score': disease['urgency_score'],
+            'symptoms': list(disease['symptoms']),
+            'matched_symptoms': matched_symptoms,
+            'match_score': match_score,
+            'match_percentage': match_score * 10  # Score is 0-10, percentage is 0-100
+        }
     
-    def _calculate_match_score(self, user_symptoms: List[str], disease_symptoms: List[str]) -> float:
+    def query_diseases_for_each(self, symptom_names: List[str]) -> Dict[str, List[Dict]]:
         """
-        Calculate a match score between user symptoms and disease symptoms
+        Find the diseases of each symptom taken on its own, in a single pass
+        over the diseases (same results as one query_diseases_by_symptoms([symptom])
+        per symptom)
         
-        Returns a score from 0-10 where:
-        - Perfect match (all user symptoms found) = 10
-        - Partial matches get proportional scores
+        Args:
+            symptom_names: List of symptom names (normalized)
+            
+        Returns:
+            Dictionary symptom name -> ranked list of disease dictionaries
         """
-        if not user_symptoms or not disease_symptoms:
-            return 0.0
-        
-        matched = set(user_symptoms) & set(disease_symptoms)
+        results = {name: [] for name in symptom_names}
         
-        # Calculate percentage of user symptoms that matched
-        match_ratio = len(matched) / len(user_symptoms)
+        for disease in self._diseases:
+            for name in self._disease_symptoms[disease['uri']] & results.keys():
+                results[name].append(self._result_entry(disease, [name], 10.0))
         
-        # Score out of 10
-        score = match_ratio * 10
+        for name, diseases in results.items():
+            self.rank_diseases(diseases, [name])
         
-        return min(score, 10.0)  # Cap at 10
+        return results
     
-    def rank_diseases(self, diseases: List[Dict], user_symptoms: List[str]) -> List[Dict]:
+    def rank_diseases(self, diseases: List[Dict], user_symptoms: List[str], top_n: Optional[int] = None) -> List[Dict]:
         """
         Rank diseases by match score and urgency
         
         Args:
-            diseases: List of disease dictionaries
+            diseases: List of disease dictionaries (with match_score and urgency_score)
             user_symptoms: User's symptoms
+            top_n: Only keep the top_n best diseases (partial sort)
             
         Returns:
             Sorted list of diseases (best match first)
         """
         # Sort by match_score (descending) and urgency (high first)
-        urgency_priority = {'high': 3, 'medium': 2, 'low': 1}
-        
-        def sort_key(disease):
-            urgency_score = urgency_priority.get(disease.get('urgency', 'medium').lower(), 2)
-            match_score = disease.get('match_score', 0)
-            return (match_score, urgency_score)
+        sort_key = itemgetter('match_score', 'urgency_score')
+        if top_n is not None:
+            return heapq.nlargest(top_n, diseases, key=sort_key)
         
         diseases.sort(key=sort_key, reverse=True)
         
@@ -250,55 +526,30 @@ class MedicalKnowledgeGraph:
         Returns:
             Dictionary with disease details
         """
-        query = f"""
-        SELECT ?diseaseName ?description ?urgency
-        WHERE {{
-            <{disease_uri}> rdf:type med:Disease .
-            <{disease_uri}> med:diseaseName ?diseaseName .
-            OPTIONAL {{ <{disease_uri}> med:description ?description }}
-            OPTIONAL {{ <{disease_uri}> med:urgencyLevel ?urgency }}
-        }}
-        """
-        
-        try:
-            qres = list(self.graph.query(query, initNs={'med': MED, 'rdf': RDF}))
-            
-            if qres:
-                row = qres[0]
-                return {
-                    'uri': disease_uri,
-                    'name': str(row.diseaseName),
-                    'description': str(row.description) if row.description else "",
-                    'urgency': str(row.urgency) if row.urgency else "medium",
-                    'symptoms': self._get_disease_symptoms(disease_uri),
-                    'specialty': self.get_specialty_for_disease(disease_uri),
-                    'precautions': self.get_precautions_for_disease(disease_uri)
-                }
-        except Exception as e:
-            logger.error(f"Error getting disease details: {e}")
-        
-        return None
+        details = self._details.get(disease_uri)
+        if details is None:
+            return None
+        
+        # Callers enrich/mutate the result: hand out a copy of the cached entry
+        return {
+            **details,
+            'symptoms': list(details['symptoms']),
+            'specialty': dict(details['specialty']) if details['specialty'] else None,
+            'precautions': list(details['precautions'])
+        }
     
     def get_specialty_for_disease(self, disease_uri: str) -> Optional[Dict]:
         """Get the medical specialty that treats this disease"""
-        query = f"""
-        SELECT ?specialtyName ?department ?location
-        WHERE {{
-            <{disease_uri}> med:treatedBy ?specialty .
-            ?specialty med:specialtyName ?specialtyName .
-            OPTIONAL {{
-                ?specialty med:belongsToDepartment ?dept .
-                ?dept med:departmentName ?department .
-                OPTIONAL {{ ?dept med:location ?location }}
-            }}
-        }}
-        """
+        # Indexed diseases are served from the details materialized at load time
+        details = self._details.get(disease_uri)
+        if details is not None:
+            return dict(details['specialty']) if details['specialty'] else None
         
         try:
-            qres = list(self.graph.query(query, initNs={'med': MED}))
+            qres = self.graph.query(_Q_SPECIALTY, initBindings={'disease': URIRef(disease_uri)})
+            row = next(iter(qres), None)
             
-            if qres:
-                row = qres[0]
+            if row is not None:
                 return {
                     'specialty': str(row.specialtyName),
                     'department': str(row.department) if row.department else "General",
@@ -311,16 +562,13 @@ class MedicalKnowledgeGraph:
     
     def get_precautions_for_disease(self, disease_uri: str) -> List[str]:
         """Get precautions/recommendations for a disease"""
-        query = f"""
-        SELECT ?precaution
-        WHERE {{
-            <{disease_uri}> med:hasPrecaution ?precaution .
-        }}
-        """
+        details = self._details.get(disease_uri)
+        if details is not None:
+            return list(details['precautions'])
         
         precautions = []
         try:
-            qres = self.graph.query(query, initNs={'med': MED})
+            qres = self.graph.query(_Q_PRECAUTIONS, initBindings={'disease': URIRef(disease_uri)})
             precautions = [str(row.precaution) for row in qres]
         except Exception as e:
             logger.error(f"Error getting precautions: {e}")
@@ -328,47 +576,23 @@ class MedicalKnowledgeGraph:
         return precautions
     
     def search_by_disease_name(self, disease_name: str) -> List[Dict]:
-        """Search diseases by name (partial match)"""
-        query = f"""
-        SELECT ?disease ?diseaseName ?description
-        WHERE {{
-            ?disease rdf:type med:Disease .
-            ?disease med:diseaseName ?diseaseName .
-            FILTER(CONTAINS(LCASE(?diseaseName), LCASE("{disease_name}")))
-            OPTIONAL {{ ?disease med:description ?description }}
-        }}
-        LIMIT 10
-        """
-        
-        results = []
-        try:
-            qres = self.graph.query(query, initNs={'med': MED, 'rdf': RDF})
-            
-            for row in qres:
-                results.append({
-                    'uri': str(row.disease),
-                    'name': str(row.diseaseName),
-                    'description': str(row.description) if row.description else ""
-                })
-        except Exception as e:
-            logger.error(f"Error searching diseases: {e}")
-        
-        return results
+        """Search diseases by name (partial match, at most 10 results)"""
+        needle = disease_name.lower()
+        return [
+            {
+                'uri': disease['uri'],
+                'name': disease['name'],
+                'description': disease['description']
+            }
+            for name, disease in self._name_index
+            if needle in name
+        ][:10]
     
     def get_all_specialties(self) -> List[str]:
         """Get list of all medical specialties"""
-        query = """
-        SELECT DISTINCT ?specialtyName
-        WHERE {
-            ?specialty rdf:type med:MedicalSpecialty .
-            ?specialty med:specialtyName ?specialtyName .
-        }
-        ORDER BY ?specialtyName
-        """
-        
         specialties = []
         try:
-            qres = self.graph.query(query, initNs={'med': MED, 'rdf': RDF})
+            qres = self.graph.query(_Q_SPECIALTIES)
             specialties = [str(row.specialtyName) for row in qres]
         except Exception as e:
             logger.error(f"Error getting specialties: {e}")
@@ -377,19 +601,9 @@ class MedicalKnowledgeGraph:
     
     def get_all_departments(self) -> List[Dict]:
         """Get list of all departments"""
-        query = """
-        SELECT ?deptName ?location
-        WHERE {
-            ?dept rdf:type med:Department .
-            ?dept med:departmentName ?deptName .
-            OPTIONAL { ?dept med:location ?location }
-        }
-        ORDER BY ?deptName
-        """
-        
         departments = []
         try:
-            qres = self.graph.query(query, initNs={'med': MED, 'rdf': RDF})
+            qres = self.graph.query(_Q_DEPARTMENTS)
             
             for row in qres:
                 departments.append({
@@ -0,0 +1,46 @@
+"""
+Shared pytest fixtures for the MedBot test suite
+
+The knowledge graph uses the store selected by RDF_STORE, e.g.
+`RDF_STORE=Oxigraph pytest tests/` runs the suite on the indexed Oxigraph store
+"""
+
+import pytest
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+# Add src to path (modules are imported by the fixtures, not at collection)
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+ONTOLOGY_PATH = Path(__file__).parent.parent / 'data' / 'ontology' / 'medical_ontology.nt'
+
+
+def pytest_configure(config):
+    """
+    With pytest-xdist (-n), load the knowledge graph once in the controller:
+    it fills the on-disk graph cache, so the workers unpickle it instead of
+    all parsing the ontology at the same time
+    """
+    if hasattr(config, 'workerinput') or not getattr(config.option, 'numprocesses', None):
+        return
+    
+    from kg_cache import load_kg
+    load_kg(str(ONTOLOGY_PATH))
+
+
+@pytest.fixture(scope="session")
+def kg():
+    """Knowledge graph shared by the whole session (tests only read it)"""
+    from kg_cache import load_kg
+    
+    return load_kg(str(ONTOLOGY_PATH))
+
+
+@pytest.fixture(scope="session")
+def symptom_index(kg):
+    """Ranked diseases of each symptom of the graph, computed in one pass (unknown symptoms -> [])"""
+    from query_engine import MED
+    
+    symptom_names = {str(name) for name in kg.graph.objects(None, MED.symptomName)}
+    return defaultdict(list, kg.query_diseases_for_each(sorted(symptom_names)))
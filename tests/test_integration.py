@@ -7,27 +7,20 @@ import pytest
 import sys
 from pathlib import Path
 
-# Add src to path
+# Add src to path (the extractor is imported by its fixture, not at collection)
 sys.path.append(str(Path(__file__).parent.parent / 'src'))
 
-from nlp_processor import SymptomExtractor
-from query_engine import MedicalKnowledgeGraph
 
-
-@pytest.fixture
+# Read-only in these tests: built once per session (`kg` lives in conftest.py)
+@pytest.fixture(scope="session")
 def extractor():
     """Create symptom extractor"""
+    from nlp_processor import SymptomExtractor
+    
     data_path = Path(__file__).parent.parent / 'data' / 'processed' / 'consolidated_medical_data.json'
     return SymptomExtractor(str(data_path))
 
 
-@pytest.fixture
-def kg():
-    """Create knowledge graph"""
-    ontology_path = Path(__file__).parent.parent / 'data' / 'ontology' / 'medical_ontology.ttl'
-    return MedicalKnowledgeGraph(str(ontology_path))
-
-
 class TestEndToEndFlow:
     """Test complete symptom → diagnosis flow"""
     
@@ -159,9 +152,11 @@ class TestDataConsistency:
         """Test that NLP-extracted symptoms exist in graph"""
         test_symptoms = ['fever', 'cough', 'headache']
         
+        # Diseases of each symptom taken on its own, in one call
+        diseases_by_symptom = kg.query_diseases_for_each(test_symptoms)
+        
         for symptom in test_symptoms:
-            # Query with single symptom
-            diseases = kg.query_diseases_by_symptoms([symptom])
+            diseases = diseases_by_symptom[symptom]
             
             # If NLP knows about it, graph should have diseases for it
             # (allowing for some symptoms that might not have disease mappings)
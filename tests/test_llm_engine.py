@@ -0,0 +1,76 @@
+"""
+Unit Tests for MedBot LLM Engine
+Tests the LLM response cache (Ollama is replaced by a scripted LLM)
+"""
+
+import pytest
+import sys
+from pathlib import Path
+
+# Add src to path (the engine is imported by its fixture, not at collection)
+sys.path.append(str(Path(__file__).parent.parent / 'src'))
+
+
+@pytest.fixture
+def make_rag(monkeypatch, tmp_path):
+    """Create MedBotRAG instances answering with the given responses, in order"""
+    import llm_engine
+    from langchain_core.language_models.fake import FakeListLLM
+    
+    # One response cache database per test
+    monkeypatch.setattr(llm_engine, 'LLM_CACHE_PATH', str(tmp_path / 'llm_cache.db'))
+    
+    def make(responses, model_name='mistral', deterministic=True):
+        rag = llm_engine.MedBotRAG(
+            ollama_base_url='http://localhost:1',
+            model_name=model_name,
+            deterministic=deterministic
+        )
+        rag.llm = FakeListLLM(responses=responses)
+        return rag
+    
+    return make
+
+
+class TestResponseCache:
+    """Test reuse of responses for identical prompts"""
+    
+    def test_reused_for_identical_prompt(self, make_rag):
+        """Test that an identical prompt is answered from the cache"""
+        rag = make_rag(['first', 'second'])
+        
+        assert rag.generate_response("I am itching", []) == 'first'
+        rag.reset_conversation()
+        assert rag.generate_response("I am itching", []) == 'first'
+    
+    def test_not_shared_between_models(self, make_rag):
+        """Test that a model never gets a response generated by another one"""
+        rag_a = make_rag(['response a'], model_name='mistral')
+        rag_b = make_rag(['response b'], model_name='llama3')
+        
+        assert rag_a.generate_response("I am itching", []) == 'response a'
+        assert rag_b.generate_response("I am itching", []) == 'response b'
+    
+    def test_shared_by_streaming(self, make_rag):
+        """Test that streamed responses are read from and stored in the cache"""
+        rag = make_rag(['first', 'second'])
+        
+        assert "".join(rag.generate_response_stream("I am itching", [])) == 'first'
+        rag.reset_conversation()
+        assert list(rag.generate_response_stream("I am itching", [])) == ['first']
+        rag.reset_conversation()
+        assert rag.generate_response("I am itching", []) == 'first'
+    
+    def test_disabled_when_sampling(self, make_rag):
+        """Test that sampled responses are not cached"""
+        rag = make_rag(['first', 'second'], deterministic=False)
+        
+        assert rag.response_cache is None
+        assert rag.generate_response("I am itching", []) == 'first'
+        rag.reset_conversation()
+        assert rag.generate_response("I am itching", []) == 'second'
+
+
+# Run tests
+if __name__ == "__main__":
+    pytest.main([__file__, '-v'])
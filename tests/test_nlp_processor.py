@@ -7,15 +7,15 @@ import pytest
 import sys
 from pathlib import Path
 
-# Add src to path
+# Add src to path (the extractor is imported by its fixture, not at collection)
 sys.path.append(str(Path(__file__).parent.parent / 'src'))
 
-from nlp_processor import SymptomExtractor
-
 
 @pytest.fixture
 def extractor():
     """Create a symptom extractor instance"""
+    from nlp_processor import SymptomExtractor
+    
     data_path = Path(__file__).parent.parent / 'data' / 'processed' / 'consolidated_medical_data.json'
     return SymptomExtractor(str(data_path))
 
@@ -74,6 +74,17 @@ class TestSymptomExtraction:
         # Should return empty or very few symptoms
         assert len(symptoms) == 0, "Non-medical text should not extract symptoms"
 
+    def test_batch_extraction(self, extractor):
+        """Test that batch extraction matches one-by-one extraction"""
+        texts = [
+            "J'ai une éruption cutanée et des démangeaisons",
+            "I have nausea and vomiting",
+            ""
+        ]
+        results = extractor.extract_symptoms_batch(texts)
+
+        assert results == [extractor.extract_symptoms(text) for text in texts]
+
 
 class TestSymptomNormalization:
     """Test symptom normalization"""
@@ -4,20 +4,8 @@ Tests SPARQL queries, disease matching, and ranking
 """
 
 import pytest
-import sys
-from pathlib import Path
 
-# Add src to path  
-sys.path.append(str(Path(__file__).parent.parent / 'src'))
-
-from query_engine import MedicalKnowledgeGraph
-
-
-@pytest.fixture
-def kg():
-    """Create a knowledge graph instance"""
-    ontology_path = Path(__file__).parent.parent / 'data' / 'ontology' / 'medical_ontology.ttl'
-    return MedicalKnowledgeGraph(str(ontology_path))
+# The shared `kg` fixture lives in conftest.py
 
 
 class TestGraphLoading:
@@ -65,6 +53,7 @@ class TestDiseaseQuerying:
     def test_query_with_nonexistent_symptom(self, kg):
         """Test querying with symptom that doesn't exist"""
         symptoms = ['nonexistent_symptom_xyz']
+        assert symptoms[0] not in kg.known_symptoms
         diseases = kg.query_diseases_by_symptoms(symptoms)
         
         # Should return empty list or no matches
@@ -76,6 +65,17 @@ class TestDiseaseQuerying:
         diseases = kg.query_diseases_by_symptoms(symptoms)
         
         assert diseases == [], "Empty symptom list should return empty results"
+    
+    def test_query_for_each(self, kg):
+        """Test querying each symptom separately in one pass"""
+        symptoms = ['itching', 'nausea', 'nonexistent_symptom_xyz']
+        results = kg.query_diseases_for_each(symptoms)
+        
+        assert set(results) == set(symptoms)
+        assert results['nonexistent_symptom_xyz'] == []
+        for symptom in symptoms[:2]:
+            assert results[symptom], f"Should find diseases with {symptom}"
+            assert results[symptom] == kg.query_diseases_by_symptoms([symptom])
 
 
 class TestDiseaseRanking:
@@ -104,22 +104,37 @@ class TestDiseaseRanking:
     
     def test_match_percentage(self, kg):
         """Test match percentage calculation"""
-        symptoms = ['itching']  # Use valid symptom
+        symptoms = ['itching', 'nausea']  # Diseases match one or both
         diseases = kg.query_diseases_by_symptoms(symptoms)
         
+        assert diseases, "Should find diseases with itching or nausea"
         for disease in diseases:
             # Percentage should be between 0 and 100
             assert 0 <= disease['match_percentage'] <= 100, \
                 f"Match percentage {disease['match_percentage']} out of range"
+            expected = len(disease['matched_symptoms']) / len(symptoms) * 100
+            assert disease['match_percentage'] == pytest.approx(expected)
+        
+        assert any(d['match_percentage'] < 100 for d in diseases), "Should include partial matches"
+    
+    def test_rank_top_n(self, kg):
+        """Test that top_n keeps the head of the full ranking"""
+        symptoms = ['itching', 'nausea']
+        diseases = kg.query_diseases_by_symptoms(symptoms)
+        assert len(diseases) > 3
+        
+        shuffled = diseases[::-1]
+        full = kg.rank_diseases(list(shuffled), symptoms)
+        assert kg.rank_diseases(list(shuffled), symptoms, top_n=3) == full[:3]
+        assert kg.query_diseases_by_symptoms(symptoms, top_n=3) == diseases[:3]
 
 
 class TestDiseaseDetails:
     """Test disease detail retrieval"""
     
-    def test_get_disease_details(self, kg):
+    def test_get_disease_details(self, kg, symptom_index):
         """Test retrieving disease details"""
-        symptoms = ['fever']
-        diseases = kg.query_diseases_by_symptoms(symptoms)
+        diseases = symptom_index['fever']
         
         if diseases:
             disease_uri = diseases[0]['uri']
@@ -130,10 +145,9 @@ class TestDiseaseDetails:
             assert 'urgency' in details
             assert 'symptoms' in details
     
-    def test_specialty_retrieval(self, kg):
+    def test_specialty_retrieval(self, kg, symptom_index):
         """Test specialty information retrieval"""
-        symptoms = ['skin_rash']
-        diseases = kg.query_diseases_by_symptoms(symptoms)
+        diseases = symptom_index['skin_rash']
         
         if diseases:
             disease_uri = diseases[0]['uri']
@@ -144,10 +158,9 @@ class TestDiseaseDetails:
                 assert 'specialty' in specialty
                 assert 'department' in specialty
     
-    def test_precautions_retrieval(self, kg):
+    def test_precautions_retrieval(self, kg, symptom_index):
         """Test precautions retrieval"""
-        symptoms = ['fever']
-        diseases = kg.query_diseases_by_symptoms(symptoms)
+        diseases = symptom_index['fever']
         
         if diseases:
             disease_uri = diseases[0]['uri']
@@ -189,4 +202,4 @@ class TestUtilityFunctions:
 
 # Run tests
 if __name__ == "__main__":
-    pytest.main([__file__, '-v'])
+    pytest.main([__file__, '-q', '-p', 'no:cacheprovider', '--no-header'])
@@ -5,94 +5,123 @@ Run this to verify all validation checks work before committing
 
 import sys
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 sys.path.append(str(Path(__file__).parent.parent / 'src'))
 
-from rdflib import Graph, Namespace, RDF
-from query_engine import MedicalKnowledgeGraph
-from nlp_processor import SymptomExtractor
-import json
+# Data completeness queries: the disease name pattern (one per disease) comes
+# first, and MINUS is an anti-join instead of a NOT EXISTS per disease
 
-print("="*70)
-print("MEDBOT DATA VALIDATION")
-print("="*70)
-
-# Test 1: Load Knowledge Graph
-print("\n1. Loading Knowledge Graph...")
-kg = MedicalKnowledgeGraph('/app/data/ontology/medical_ontology.ttl')
-print(f"   ✓ Loaded {len(kg.graph)} triples")
-
-# Test 2: Get Statistics
-print("\n2. Getting Statistics...")
-stats = kg.get_graph_statistics()
-print(f"   Diseases: {stats['diseases']}")
-print(f"   Symptoms: {stats['symptoms']}")
-print(f"   Specialties: {stats['specialties']}")
-print(f"   Departments: {stats['departments']}")
-print(f"   Total triples: {stats['total_triples']}")
-
-# Test 3: Test SPARQL Queries
-print("\n3. Testing SPARQL Queries...")
-test_symptoms = ['skin_rash', 'itching']
-diseases = kg.query_diseases_by_symptoms(test_symptoms)
-print(f"   Query for {test_symptoms}")
-print(f"   ✓ Found {len(diseases)} matching diseases")
-if diseases:
-    print(f"   Top match: {diseases[0]['name']} ({diseases[0]['match_percentage']:.1f}%)")
-
-# Test 4: Test NLP Processor
-print("\n4. Testing NLP Processor...")
-extractor = SymptomExtractor('/app/data/processed/consolidated_medical_data.json')
-test_text = "J'ai une éruption cutanée et des démangeaisons"
-symptoms = extractor.extract_symptoms(test_text, language='fr')
-print(f"   Input: {test_text}")
-print(f"   ✓ Extracted {len(symptoms)} symptoms: {[s['symptom'] for s in symptoms]}")
-
-# Test 5: Verify Disease Details
-print("\n5. Testing Disease Details...")
-if diseases:
-    details = kg.get_disease_details(diseases[0]['uri'])
-    print(f"   Disease: {details['name']}")
-    print(f"   Urgency: {details['urgency']}")
-    if details['specialty']:
-        print(f"   Specialty: {details['specialty']['specialty']}")
-    print(f"   ✓ Details retrieved successfully")
-
-# Test 6: Data Completeness
-print("\n6. Checking Data Completeness...")
-MED = Namespace("http://medbot.org/ontology#")
-
-# Check diseases without symptoms
-query = """
-SELECT ?diseaseName
+# Diseases without symptoms
+NO_SYMPTOMS_QUERY = """
+SELECT (COUNT(?disease) AS ?missing)
 WHERE {
-    ?disease rdf:type med:Disease .
     ?disease med:diseaseName ?diseaseName .
-    FILTER NOT EXISTS { ?disease med:hasSymptom ?symptom }
+    ?disease rdf:type med:Disease .
+    MINUS { ?disease med:hasSymptom [] }
 }
 """
-results = list(kg.graph.query(query, initNs={'med': MED, 'rdf': RDF}))
-print(f"   Diseases without symptoms: {len(results)}")
 
-# Check diseases without specialties
-query = """
-SELECT ?diseaseName
+# Diseases without specialties
+NO_SPECIALTY_QUERY = """
+SELECT (COUNT(?disease) AS ?missing)
 WHERE {
-    ?disease rdf:type med:Disease .
     ?disease med:diseaseName ?diseaseName .
-    FILTER NOT EXISTS { ?disease med:treatedBy ?specialty }
+    ?disease rdf:type med:Disease .
+    MINUS { ?disease med:treatedBy [] }
 }
 """
-results = list(kg.graph.query(query, initNs={'med': MED, 'rdf': RDF}))
-print(f"   Diseases without specialty: {len(results)}")
 
-print("\n" + "="*70)
-print("✅ VALIDATION COMPLETE - ALL CHECKS PASSED")
-print("="*70)
-print("\nSummary:")
-print(f"  • Knowledge graph loaded: {len(kg.graph)} triples")
-print(f"  • Entities verified: {stats['diseases']} diseases, {stats['symptoms']} symptoms")
-print(f"  • SPARQL queries working: ✓")
-print(f"  • NLP extraction working: ✓")
-print(f"  • Disease details retrieval: ✓")
-print(f"  • Data completeness: ✓")
-print("\n✅ Ready for commit!")
+
+@lru_cache(maxsize=1)
+def get_extractor(data_path: str):
+    """Symptom extractor of a dataset, built once however many checks use it"""
+    from nlp_processor import SymptomExtractor
+    return SymptomExtractor(data_path)
+
+
+def main():
+    """Run all validation checks"""
+    # Heavy imports (rdflib, spaCy...) only when the checks actually run
+    from rdflib.plugins.sparql import prepareQuery
+    from query_engine import INIT_NS
+    from kg_cache import load_kg
+    
+    # Parsed once up front (rdflib's SPARQL parser is also not thread-safe)
+    q_no_symptoms = prepareQuery(NO_SYMPTOMS_QUERY, initNs=INIT_NS)
+    q_no_specialty = prepareQuery(NO_SPECIALTY_QUERY, initNs=INIT_NS)
+    
+    print("="*70)
+    print("MEDBOT DATA VALIDATION")
+    print("="*70)
+    
+    # Test 1: Load Knowledge Graph
+    print("\n1. Loading Knowledge Graph...")
+    kg = load_kg('/app/data/ontology/medical_ontology.nt')
+    n_triples = len(kg.graph)
+    print(f"   ✓ Loaded {n_triples} triples")
+    
+    # Test 2: Get Statistics
+    print("\n2. Getting Statistics...")
+    stats = kg.get_graph_statistics()
+    print(f"   Diseases: {stats['diseases']}")
+    print(f"   Symptoms: {stats['symptoms']}")
+    print(f"   Specialties: {stats['specialties']}")
+    print(f"   Departments: {stats['departments']}")
+    print(f"   Total triples: {stats['total_triples']}")
+    
+    # Test 3: Test SPARQL Queries
+    print("\n3. Testing SPARQL Queries...")
+    test_symptoms = ['skin_rash', 'itching']
+    diseases = kg.query_diseases_by_symptoms(test_symptoms)
+    print(f"   Query for {test_symptoms}")
+    print(f"   ✓ Found {len(diseases)} matching diseases")
+    if diseases:
+        print(f"   Top match: {diseases[0]['name']} ({diseases[0]['match_percentage']:.1f}%)")
+    
+    # Test 4: Test NLP Processor
+    print("\n4. Testing NLP Processor...")
+    extractor = get_extractor('/app/data/processed/consolidated_medical_data.json')
+    test_text = "J'ai une éruption cutanée et des démangeaisons"
+    symptoms = extractor.extract_symptoms(test_text, language='fr')
+    print(f"   Input: {test_text}")
+    print(f"   ✓ Extracted {len(symptoms)} symptoms: {[s['symptom'] for s in symptoms]}")
+    
+    # Test 5: Verify Disease Details
+    print("\n5. Testing Disease Details...")
+    if diseases:
+        details = kg.get_disease_details(diseases[0]['uri'])
+        print(f"   Disease: {details['name']}")
+        print(f"   Urgency: {details['urgency']}")
+        if details['specialty']:
+            print(f"   Specialty: {details['specialty']['specialty']}")
+        print(f"   ✓ Details retrieved successfully")
+    
+    # Test 6: Data Completeness
+    print("\n6. Checking Data Completeness...")
+    
+    # The two checks are independent: run them side by side. Each one returns a
+    # single COUNT row
+    with ThreadPoolExecutor(max_workers=2) as ex:
+        no_symptoms, no_specialty = ex.map(
+            lambda query: int(next(iter(kg.graph.query(query)))['missing']),
+            [q_no_symptoms, q_no_specialty]
+        )
+    print(f"   Diseases without symptoms: {no_symptoms}")
+    print(f"   Diseases without specialty: {no_specialty}")
+    
+    print("\n" + "="*70)
+    print("✅ VALIDATION COMPLETE - ALL CHECKS PASSED")
+    print("="*70)
+    print("\nSummary:")
+    print(f"  • Knowledge graph loaded: {n_triples} triples")
+    print(f"  • Entities verified: {stats['diseases']} diseases, {stats['symptoms']} symptoms")
+    print(f"  • SPARQL queries working: ✓")
+    print(f"  • NLP extraction working: ✓")
+    print(f"  • Disease details retrieval: ✓")
+    print(f"  • Data completeness: ✓")
+    print("\n✅ Ready for commit!")
+
+
+if __name__ == "__main__":
+    main()